@@ -0,0 +1,172 @@
+import re
+from collections import Counter
+from itertools import chain
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from utils.segmenter import STOP_WORDS, get_segmenter
+
+HEADING_PATTERN = re.compile(r'^#+')
+TITLE_PATTERN = re.compile(r'#\s+(.+)$')
+
+@dataclass
+class Heading:
+    """文章中的一个标题行"""
+    level: int
+    line: str
+    paragraph: int  # 所在段落序号
+    line_index: int  # 在段落中的行号
+    parent: Optional[int] = None  # 上级标题在标题列表中的序号
+
+
+class ArticleAnalysis:
+    """
+    文章分析模型：按段落（以空行分隔）保存文本、词频和标题
+    构建时只遍历一次全文，各优化步骤修改段落时只重新分析被修改的段落，
+    且推迟到下次读取词频或标题时才分析，同一段落被多次修改也只分析一次；
+    全文词频由各段落的分词结果汇总，不再重新分词
+    """
+    def __init__(self, content: str, manifest=None):
+        """
+        :param content: 文章内容
+        :param manifest: 可选，ArticleManifest，内容未变化的段落复用上次的分词结果
+        """
+        self.manifest = manifest
+        self.paragraphs: List[str] = content.split('\n\n')
+        self.lowered: List[str] = [para.lower() for para in self.paragraphs]
+        self.paragraph_tokens: List[List[str]] = [[] for _ in self.paragraphs]
+        self.paragraph_headings: List[List[Heading]] = [[] for _ in self.paragraphs]
+        self._frequencies = None
+        self.segmenter = get_segmenter()
+        self._dirty = set(range(len(self.paragraphs)))
+        self._refresh()
+
+    @property
+    def frequencies(self) -> Counter:
+        """
+        全文词频，按首次出现的顺序排列
+        """
+        self._refresh()
+        if self._frequencies is None:
+            self._frequencies = Counter(chain.from_iterable(self.paragraph_tokens))
+        return self._frequencies
+
+    @property
+    def word_count(self) -> int:
+        self._refresh()
+        return sum(len(tokens) for tokens in self.paragraph_tokens)
+
+    def tokenize(self, text: str) -> List[str]:
+        """
+        分词，text 已转为小写；中文按词典切分为词语，其他文字按 \\w+ 切分
+        """
+        return self.segmenter.cut(text)
+
+    def text(self) -> str:
+        return '\n\n'.join(self.paragraphs)
+
+    def update_paragraph(self, index: int, text: str):
+        """
+        修改一个段落并更新词频和标题
+        """
+        if text == self.paragraphs[index]:
+            return
+        self.paragraphs[index] = text
+        self.lowered[index] = text.lower()
+        self._dirty.add(index)
+
+    def replace_paragraph(self, index: int, texts: List[str]):
+        """
+        用多个段落替换一个段落（例如拆分过长的段落）
+        """
+        self._refresh()
+        self.paragraphs[index:index + 1] = texts
+        self.lowered[index:index + 1] = [text.lower() for text in texts]
+        self.paragraph_tokens[index:index + 1] = [[] for _ in texts]
+        self.paragraph_headings[index:index + 1] = [[] for _ in texts]
+        for i in range(index + len(texts), len(self.paragraphs)):
+            for heading in self.paragraph_headings[i]:
+                heading.paragraph = i
+        self._dirty.update(range(index, index + len(texts)))
+
+    def top_keywords(self, n: int = 5, weights: Optional[Dict[str, float]] = None) -> List[str]:
+        """
+        出现次数最多的n个关键词（长度大于1且不是常用虚词），次数相同时按首次出现的顺序
+        :param weights: 可选，词的权重（例如语料库IDF），按 次数×权重 排序，未收录的词取最大权重
+        """
+        ranked = self.frequencies.most_common()
+        if weights:
+            default = max(weights.values())
+            ranked.sort(key=lambda item: -item[1] * weights.get(item[0], default))
+        keywords = []
+        for word, _ in ranked:
+            if len(keywords) >= n:
+                break
+            if len(word) > 1 and word not in STOP_WORDS:
+                keywords.append(word)
+        return keywords
+
+    def headings(self) -> List[Heading]:
+        """
+        按文中顺序返回所有标题，并填写上级标题
+        """
+        self._refresh()
+        result = []
+        stack = []
+        for paragraph_headings in self.paragraph_headings:
+            for heading in paragraph_headings:
+                while stack and result[stack[-1]].level >= heading.level:
+                    stack.pop()
+                heading.parent = stack[-1] if stack else None
+                stack.append(len(result))
+                result.append(heading)
+        return result
+
+    def set_heading_level(self, heading: Heading, level: int):
+        """
+        修改标题的层级
+        """
+        lines = self.paragraphs[heading.paragraph].split('\n')
+        lines[heading.line_index] = '#' * level + lines[heading.line_index][heading.level:]
+        self.update_paragraph(heading.paragraph, '\n'.join(lines))
+
+    def title(self) -> Optional[str]:
+        """
+        第一个一级标题的文字
+        """
+        for heading in self.headings():
+            match = TITLE_PATTERN.match(heading.line)
+            if heading.level == 1 and match:
+                return match.group(1)
+        return None
+
+    def description(self) -> Optional[str]:
+        """
+        第一个位于两个段落之间、不是标题的单行段落
+        """
+        for para in self.paragraphs[1:-1]:
+            if len(para) > 1 and para[0] not in '#\n' and '\n' not in para:
+                return para
+        return None
+
+    def _refresh(self):
+        """
+        分析被修改过的段落
+        """
+        if not self._dirty:
+            return
+        for index in self._dirty:
+            self._analyze(index)
+        self._dirty.clear()
+        self._frequencies = None
+
+    def _analyze(self, index: int):
+        para = self.paragraphs[index]
+        if self.manifest is not None:
+            self.paragraph_tokens[index] = self.manifest.tokens(self.lowered[index], self.tokenize)
+        else:
+            self.paragraph_tokens[index] = self.tokenize(self.lowered[index])
+        self.paragraph_headings[index] = [
+            Heading(len(match.group()), line, index, line_index)
+            for line_index, line in enumerate(para.split('\n'))
+            for match in [HEADING_PATTERN.match(line)] if match
+        ]
@@ -1,11 +1,32 @@
-from openai import OpenAI
+from openai import APITimeoutError, APIConnectionError, APIStatusError, RateLimitError
 from utils.config import Config
+from utils.state import GenerationMetrics
+from utils.cache import DiskCache
+from utils.rate_limiter import get_rate_limiter, backoff_delay, parse_retry_after
+from utils.clients import get_openai_client
+from utils.token_budget import TokenBudgetPlanner, ReasoningFilter, split_reasoning
+from utils.endpoints import get_endpoint_pool
+import asyncio
+import re
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed
 from requests.exceptions import RequestException, Timeout, ConnectionError
 import logging
 
 class ArticleGenerator:
-    def __init__(self):
+    BASE_URL = "https://api.ppinfra.com/v3/openai"
+    MODEL = "deepseek/deepseek-r1/community"
+    SYSTEM_PROMPT = "你是一个专业的SEO文章写手，擅长创作优质的SEO文章。"
+    
+    _hedge_executor = None
+    _hedge_executor_lock = threading.Lock()
+    
+    def __init__(self, client=None):
+        """
+        :param client: 可选，外部传入的OpenAI客户端（所有接口共用）；
+                       默认按接口从进程内注册表获取复用的客户端
+        """
         self.config = Config()
         self.logger = logging.getLogger(__name__)
         
@@ -14,80 +35,522 @@ class ArticleGenerator:
             if not api_key:
                 raise ValueError("API密钥未配置")
                 
-            self.client = OpenAI(
-                base_url="https://api.ppinfra.com/v3/openai",
-                api_key=api_key
-            )
+            self.client = client
+            self.endpoint_pool = get_endpoint_pool(self.BASE_URL, self.MODEL, api_key)
             self.logger.info("API客户端初始化成功")
             
+            self.cache_enabled = self.config.get('cache_enabled', True)
+            self.cache = DiskCache(
+                'articles',
+                max_bytes=self.config.get('article_cache_max_mb', 200) * 1024 * 1024,
+                max_age=self.config.get('article_cache_max_days', 30) * 86400,
+                suffix='.md'
+            )
+            self.rate_limiter = get_rate_limiter('deepseek')
+            self.budget_planner = TokenBudgetPlanner()
+            
         except Exception as e:
             error_msg = f"API客户端初始化失败：{str(e)}"
             self.logger.error(error_msg)
             raise Exception(error_msg)
+    
+    def _create_client(self, endpoint):
+        return get_openai_client(endpoint.base_url, endpoint.api_key)
+    
+    def _client_for(self, endpoint):
+        return self.client or self._create_client(endpoint)
         
-    def generate(self, requirements, word_count, max_retries=5, retry_delay=3):
+    def generate(self, requirements, word_count, max_retries=5, retry_delay=3, use_cache=True):
         """
         生成文章内容，包含重试机制
         :param requirements: 文章要求
         :param word_count: 字数要求
         :param max_retries: 最大重试次数
         :param retry_delay: 重试间隔（秒）
+        :param use_cache: 是否使用缓存，为False时强制重新生成
         :return: 生成的文章内容
         """
         prompt = self._create_prompt(requirements, word_count)
+        metrics = GenerationMetrics(started_at=time.monotonic())
+        self.last_metrics = metrics
+        return self._complete(prompt, word_count, metrics, max_retries, retry_delay, use_cache)
+    
+    def generate_sectioned(self, requirements, word_count, max_workers=None, use_cache=True):
+        """
+        长文生成：先生成大纲，再并发生成各个二级标题小节，最后合并为完整文章
+        合并结果与 generate 的输出格式一致（# 标题 + ## 小节 + 段落）
+        :param requirements: 文章要求
+        :param word_count: 字数要求
+        :param max_workers: 同时生成的小节数，默认全部小节同时生成
+        :param use_cache: 是否使用缓存，为False时强制重新生成
+        :return: 生成的文章内容
+        """
+        metrics = GenerationMetrics(started_at=time.monotonic())
+        self.last_metrics = metrics
+        
+        section_count = self._section_count(word_count)
+        outline = self._complete(
+            self._create_outline_prompt(requirements, word_count, section_count),
+            section_count * 30,
+            GenerationMetrics(started_at=time.monotonic()),
+            use_cache=use_cache
+        )
+        title, sections = self._parse_outline(outline)
+        if not sections:
+            self.logger.warning("大纲解析失败，改为整篇生成")
+            return self.generate(requirements, word_count, use_cache=use_cache)
+        
+        self.logger.info(f"大纲生成完成，共{len(sections)}个小节，开始并发生成")
+        section_words = max(200, word_count // len(sections))
+        with ThreadPoolExecutor(max_workers=max_workers or len(sections)) as pool:
+            futures = [
+                pool.submit(
+                    self._complete,
+                    self._create_section_prompt(requirements, title, sections, index, section_words),
+                    section_words,
+                    GenerationMetrics(started_at=time.monotonic()),
+                    use_cache=use_cache
+                )
+                for index in range(len(sections))
+            ]
+            bodies = [future.result() for future in futures]
+        
+        metrics.finished_at = time.monotonic()
+        self.logger.info(f"分段生成完成，总耗时{metrics.total_time:.2f}秒")
+        return self._merge_sections(title, sections, bodies)
+    
+    def should_use_sections(self, word_count):
+        """
+        字数达到配置项 sectioned_min_words（默认3000，0表示关闭）时使用分段并发生成
+        """
+        threshold = self.config.get('sectioned_min_words', 3000)
+        return bool(threshold) and word_count >= threshold
+    
+    def _complete(self, prompt, word_count, metrics, max_retries=5, retry_delay=3, use_cache=True):
+        """
+        发送单次chat completion请求（含缓存、限流和重试），返回去除推理过程后的正文
+        """
+        cache_key = self._cache_key(prompt)
+        cached = self._cache_get(cache_key, use_cache)
+        if cached is not None:
+            return cached
         
+        max_tokens = None
         for attempt in range(max_retries):
+            request = self._build_request(prompt, max_tokens=max_tokens or self.budget_planner.plan(word_count))
+            estimated_tokens = self._estimate_tokens(request)
+            self.rate_limiter.acquire(estimated_tokens)
+            used_tokens = 0  # 请求失败时退回全部预留的额度
             try:
                 self.logger.info(f"尝试生成文章，第{attempt + 1}次尝试")
-                response = self.client.chat.completions.create(
-                    model="deepseek/deepseek-r1/community",
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "你是一个专业的SEO文章写手，擅长创作优质的SEO文章。"
-                        },
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ],
-                    stream=False,
-                    max_tokens=10240,
-                    temperature=1,
-                    top_p=1,
-                    presence_penalty=0,
-                    frequency_penalty=0,
-                    response_format={"type": "text"},
-                    extra_body={
-                        "top_k": 50,
-                        "repetition_penalty": 1,
-                        "min_p": 0
-                    }
-                )
+                response = self._hedged_create(request, estimated_tokens)
                 self.logger.info("文章生成成功")
-                return response.choices[0].message.content
+                used_tokens = self._used_tokens(response)
+                content = self._finish_response(response, request['max_tokens'], metrics)
+                if metrics.truncated and max_tokens is None and attempt < max_retries - 1:
+                    max_tokens = self._truncation_retry_budget(request['max_tokens'])
+                    if max_tokens:
+                        continue
+                self._cache_put(cache_key, content, metrics)
+                return content
+                
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, max_retries, retry_delay)
+            finally:
+                self.rate_limiter.settle(estimated_tokens, used_tokens)
+            time.sleep(delay)
+                
+        raise Exception('达到最大重试次数，请稍后重试')
+    
+    def generate_stream(self, requirements, word_count, max_retries=5, retry_delay=3, use_cache=True):
+        """
+        流式生成文章内容，每完成一个段落立即返回，便于下游提前处理
+        仅在尚未输出任何段落时重试；耗时统计保存在 self.last_metrics
+        :param requirements: 文章要求
+        :param word_count: 字数要求
+        :param max_retries: 最大重试次数
+        :param retry_delay: 重试间隔（秒）
+        :param use_cache: 是否使用缓存，为False时强制重新生成
+        :return: 段落生成器
+        """
+        prompt = self._create_prompt(requirements, word_count)
+        metrics = GenerationMetrics(started_at=time.monotonic())
+        self.last_metrics = metrics
+        
+        cache_key = self._cache_key(prompt)
+        cached = self._cache_get(cache_key, use_cache)
+        if cached is not None:
+            metrics.first_token_at = time.monotonic()
+            for para in cached.split('\n\n'):
+                if para.strip():
+                    yield self._record_paragraph(metrics, para)
+            metrics.finished_at = time.monotonic()
+            return
+        
+        for attempt in range(max_retries):
+            request = self._build_request(prompt, stream=True,
+                                          max_tokens=self.budget_planner.plan(word_count))
+            metrics.token_budget = request['max_tokens']
+            estimated_tokens = self._estimate_tokens(request)
+            # 流式请求不做对冲，只按健康状态选择接口
+            endpoint = self.endpoint_pool.ranked()[0]
+            self.rate_limiter.acquire(estimated_tokens)
+            used_tokens = 0  # 请求失败时退回全部预留的额度
+            try:
+                self.logger.info(f"尝试流式生成文章，第{attempt + 1}次尝试（{endpoint.name}）")
+                started = time.monotonic()
+                stream = self._client_for(endpoint).chat.completions.create(
+                    **dict(request, model=endpoint.model)
+                )
+                # 开始接收后中断（出错或调用方停止读取）时用量未知，保留预留的额度
+                used_tokens = None
                 
-            except Timeout:
-                error_msg = f"API请求超时（第{attempt + 1}次尝试）"
-                self.logger.warning(error_msg)
-                if attempt == max_retries - 1:
-                    raise Exception(f"{error_msg}，请稍后重试")
-                time.sleep(retry_delay * (attempt + 1))
+                # 推理过程（reasoning_content 或 <think> 标签内容）不进入正文
+                reasoning_filter = ReasoningFilter()
+                buffer = ''
+                received = []
+                usage = None
+                finish_reason = None
+                for chunk in stream:
+                    usage = getattr(chunk, 'usage', None) or usage
+                    if not chunk.choices:
+                        continue
+                    finish_reason = chunk.choices[0].finish_reason or finish_reason
+                    delta = chunk.choices[0].delta
+                    reasoning_text = getattr(delta, 'reasoning_content', None) or ''
+                    metrics.reasoning_chars += len(reasoning_text)
+                    raw_text = delta.content or ''
+                    if metrics.first_token_at is None and (raw_text or reasoning_text):
+                        metrics.first_token_at = time.monotonic()
+                    text = reasoning_filter.feed(raw_text)
+                    if not text:
+                        continue
+                    
+                    received.append(text)
+                    buffer += text
+                    *completed, buffer = buffer.split('\n\n')
+                    for para in completed:
+                        if para.strip():
+                            yield self._record_paragraph(metrics, para)
                 
-            except (ConnectionError, RequestException) as e:
-                error_msg = f"API请求错误（第{attempt + 1}次尝试）：{str(e)}"
-                self.logger.error(error_msg)
-                if attempt == max_retries - 1:
-                    raise Exception(f"{error_msg}\n请检查网络连接并重试")
-                time.sleep(retry_delay * (attempt + 1))
+                tail = reasoning_filter.flush()
+                received.append(tail)
+                buffer += tail
+                if buffer.strip():
+                    yield self._record_paragraph(metrics, buffer)
+                
+                content = ''.join(received).strip()
+                metrics.finished_at = time.monotonic()
+                metrics.reasoning_chars += reasoning_filter.reasoning_chars
+                metrics.content_chars = len(content)
+                metrics.completion_tokens = getattr(usage, 'completion_tokens', None)
+                metrics.truncated = finish_reason == 'length'
+                self.endpoint_pool.record_success(endpoint, time.monotonic() - started, request['max_tokens'])
+                used_tokens = getattr(usage, 'total_tokens', None)
+                self.budget_planner.record(metrics.token_budget, metrics.content_chars,
+                                           metrics.reasoning_chars, metrics.completion_tokens,
+                                           truncated=metrics.truncated)
+                # 段落已经输出，截断时无法重试，只提高之后的预算且不写入缓存
+                self.logger.info(f"文章流式生成成功：{metrics.summary()}")
+                self._cache_put(cache_key, content, metrics)
+                return
                 
             except Exception as e:
-                error_msg = f"未知错误：{str(e)}"
-                self.logger.error(error_msg)
-                raise Exception(f"{error_msg}\n请联系技术支持")
+                self.endpoint_pool.record_failure(endpoint)
+                # 已经输出过段落时无法无缝重试，直接报错
+                delay = self._retry_delay(e, attempt, max_retries, retry_delay,
+                                          retryable=not metrics.paragraphs)
+            finally:
+                self.rate_limiter.settle(estimated_tokens, used_tokens)
+            time.sleep(delay)
                 
         raise Exception('达到最大重试次数，请稍后重试')
     
+    def _hedged_create(self, request, estimated_tokens):
+        """
+        向最优接口发送请求；超过该接口历史延迟分位数仍未完成且限流额度允许时，
+        向下一个接口发起对冲请求，取先完成的结果
+        同步请求无法中断，落后的请求在后台线程中完成后结果被丢弃
+        """
+        endpoints = self.endpoint_pool.ranked()
+        primary = endpoints[0]
+        delay = self.endpoint_pool.hedge_delay(primary, request['max_tokens'])
+        if delay is None:
+            return self._send(primary, request)
+        
+        executor = self._get_hedge_executor()
+        futures = [executor.submit(self._send, primary, request)]
+        done, _ = wait(futures, timeout=delay)
+        if not done and self.rate_limiter.try_acquire(estimated_tokens):
+            self.logger.info(f"主请求超过{delay:.1f}秒未完成，向 {endpoints[1].name} 发起对冲请求")
+            futures.append(executor.submit(self._send, endpoints[1], request))
+        
+        errors = []
+        for future in as_completed(futures):
+            try:
+                response = future.result()
+            except Exception as e:
+                errors.append(e)
+                continue
+            # 胜出请求的用量由调用方修正，其余请求（对冲产生的第二份预留额度）完成或取消后按实际用量修正
+            for other in futures:
+                if other is not future:
+                    other.cancel()
+                    other.add_done_callback(lambda done: self._settle_abandoned(done, estimated_tokens))
+            return response
+        # 全部失败：退回对冲请求预留的额度，主请求的额度由调用方退回
+        for _ in futures[1:]:
+            self.rate_limiter.settle(estimated_tokens, 0)
+        raise errors[0]
+    
+    def _settle_abandoned(self, future, estimated_tokens):
+        """
+        修正被放弃的对冲请求预留的额度：已完成的按实际用量，被取消或失败的全部退回
+        """
+        response = None
+        if not future.cancelled() and future.exception() is None:
+            response = future.result()
+        self.rate_limiter.settle(estimated_tokens, self._used_tokens(response) or 0)
+    
+    def _send(self, endpoint, request):
+        """
+        向指定接口发送请求，并记录延迟和健康状态
+        """
+        started = time.monotonic()
+        try:
+            response = self._client_for(endpoint).chat.completions.create(
+                **dict(request, model=endpoint.model)
+            )
+        except Exception:
+            self.endpoint_pool.record_failure(endpoint)
+            raise
+        self.endpoint_pool.record_success(endpoint, time.monotonic() - started, request['max_tokens'])
+        return response
+    
+    @classmethod
+    def _get_hedge_executor(cls):
+        with cls._hedge_executor_lock:
+            if cls._hedge_executor is None:
+                cls._hedge_executor = ThreadPoolExecutor(
+                    max_workers=Config().get('hedge_workers', 32),
+                    thread_name_prefix='hedge'
+                )
+            return cls._hedge_executor
+    
+    def _retry_delay(self, error, attempt, max_retries, retry_delay, retryable=True):
+        """
+        判断错误是否可重试并计算等待时间（带抖动的指数退避）
+        限流错误会按Retry-After暂停共享限流器，不可重试时抛出异常
+        :return: 重试前需要等待的秒数
+        """
+        final = not retryable or attempt == max_retries - 1
+        
+        if isinstance(error, (Timeout, APITimeoutError)):
+            error_msg = f"API请求超时（第{attempt + 1}次尝试）"
+            self.logger.warning(error_msg)
+            if final:
+                raise Exception(f"{error_msg}，请稍后重试")
+            return backoff_delay(attempt, retry_delay)
+        
+        if isinstance(error, RateLimitError) or (
+                isinstance(error, APIStatusError) and error.status_code >= 500):
+            retry_after = parse_retry_after(error.response.headers)
+            error_msg = f"API请求被限流或服务繁忙（第{attempt + 1}次尝试，状态码{error.status_code}）"
+            self.logger.warning(error_msg)
+            if retry_after is not None:
+                self.rate_limiter.pause(retry_after)
+            if final:
+                raise Exception(f"{error_msg}，请稍后重试")
+            return backoff_delay(attempt, retry_delay, retry_after=retry_after)
+        
+        if isinstance(error, (ConnectionError, RequestException, APIConnectionError)):
+            error_msg = f"API请求错误（第{attempt + 1}次尝试）：{str(error)}"
+            self.logger.error(error_msg)
+            if final:
+                raise Exception(f"{error_msg}\n请检查网络连接并重试")
+            return backoff_delay(attempt, retry_delay)
+        
+        error_msg = f"未知错误：{str(error)}"
+        self.logger.error(error_msg)
+        raise Exception(f"{error_msg}\n请联系技术支持")
+    
+    def _finish_response(self, response, budget, metrics):
+        """
+        分离推理过程与正文，记录token用量并更新预算校准
+        :return: 去除推理过程后的正文
+        """
+        choice = response.choices[0]
+        reasoning, content = split_reasoning(
+            choice.message.content,
+            getattr(choice.message, 'reasoning_content', None)
+        )
+        usage = getattr(response, 'usage', None)
+        metrics.finished_at = time.monotonic()
+        metrics.token_budget = budget
+        metrics.completion_tokens = getattr(usage, 'completion_tokens', None)
+        metrics.content_chars = len(content)
+        metrics.reasoning_chars = len(reasoning)
+        metrics.truncated = choice.finish_reason == 'length'
+        self.budget_planner.record(budget, metrics.content_chars, metrics.reasoning_chars,
+                                   metrics.completion_tokens, truncated=metrics.truncated)
+        self.logger.info(metrics.summary())
+        return content
+    
+    def _truncation_retry_budget(self, budget):
+        """
+        输出被截断后重试一次使用的 max_tokens，已达到 token_budget_max 时返回None（不重试）
+        """
+        larger = self.budget_planner.expand(budget)
+        if larger <= budget:
+            self.logger.warning(f"输出被截断且max_tokens已达上限({budget})，返回截断的内容（不写入缓存）")
+            return None
+        self.logger.warning(f"输出被截断，以max_tokens={larger}重新生成")
+        return larger
+    
+    def _estimate_tokens(self, request):
+        """
+        估算一次请求最多消耗的token数：输入按每字符一个token估算，加上输出上限
+        """
+        prompt_chars = sum(len(message['content']) for message in request['messages'])
+        return prompt_chars + request['max_tokens']
+    
+    def _used_tokens(self, response):
+        """
+        响应中的实际用量（total_tokens），没有用量信息时返回None（限流器保留预留的额度）
+        """
+        return getattr(getattr(response, 'usage', None), 'total_tokens', None)
+    
+    def _cache_key(self, prompt):
+        """
+        缓存键：模型、系统提示词、用户提示词及采样参数
+        max_tokens 和 stream 不影响内容，不参与计算
+        """
+        request = self._build_request(prompt)
+        request.pop('stream', None)
+        request.pop('max_tokens', None)
+        return DiskCache.make_key(request)
+    
+    def _cache_get(self, cache_key, use_cache=True):
+        if not (use_cache and self.cache_enabled):
+            return None
+        content = self.cache.get_text(cache_key)
+        if content is None:
+            return None
+        stats = self.cache.stats()
+        self.logger.info(f"命中文章缓存（命中{stats['hits']}次/未命中{stats['misses']}次）")
+        return split_reasoning(content)[1]
+    
+    def _cache_put(self, cache_key, content, metrics=None):
+        # 被截断的输出不写入缓存，避免之后一直复用不完整的文章
+        if metrics is not None and metrics.truncated:
+            return
+        if self.cache_enabled and content:
+            self.cache.put_text(cache_key, content)
+    
+    def _record_paragraph(self, metrics, para):
+        if metrics.first_paragraph_at is None:
+            metrics.first_paragraph_at = time.monotonic()
+            self.logger.info(f"首段落已生成，耗时{metrics.time_to_first_paragraph:.2f}秒")
+        metrics.paragraphs += 1
+        return para.strip('\n')
+    
+    def _build_request(self, prompt, stream=False, max_tokens=10240):
+        """
+        构建chat completion请求参数，同步与异步生成器共用
+        :param max_tokens: 输出token上限，通常由 TokenBudgetPlanner 按字数规划
+        """
+        request = dict(
+            model=self.MODEL,
+            messages=[
+                {
+                    "role": "system",
+                    "content": self.SYSTEM_PROMPT
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            stream=stream,
+            max_tokens=max_tokens,
+            temperature=1,
+            top_p=1,
+            presence_penalty=0,
+            frequency_penalty=0,
+            response_format={"type": "text"},
+            extra_body={
+                "top_k": 50,
+                "repetition_penalty": 1,
+                "min_p": 0
+            }
+        )
+        if stream:
+            # 流式响应默认不返回用量，最后一个数据块中带上usage用于修正限流额度
+            request['stream_options'] = {"include_usage": True}
+        return request
+    
+    def _section_count(self, word_count):
+        """
+        按每节约600字估算小节数量，限制在3~8节
+        """
+        return max(3, min(8, round(word_count / 600)))
+    
+    def _create_outline_prompt(self, requirements, word_count, section_count):
+        return f"""请为一篇SEO文章设计大纲：
+        要求：{requirements}
+        总字数：{word_count}
+        输出格式：
+        第一行为文章标题，以"# "开头；
+        之后每行一个二级标题，以"## "开头，共{section_count}个；
+        不要输出其他任何内容。
+        """
+    
+    def _create_section_prompt(self, requirements, title, sections, index, word_count):
+        outline = '\n'.join(f"## {section}" for section in sections)
+        return f"""你正在撰写一篇SEO文章中的一个小节。
+        文章要求：{requirements}
+        文章标题：{title}
+        文章大纲：
+{outline}
+        本次只撰写第{index + 1}节"{sections[index]}"的正文，字数约{word_count}字。
+        要求：
+        1. 不要重复小节标题，不要撰写其他小节的内容
+        2. 段落之间空一行，如需细分可使用"### "三级标题
+        3. 与大纲中前后小节自然衔接，避免内容重复
+        4. 关键词密度保持在2%-3%
+        """
+    
+    def _parse_outline(self, outline):
+        """
+        解析大纲，返回 (标题, 二级标题列表)
+        """
+        title = ''
+        sections = []
+        for line in outline.splitlines():
+            line = line.strip()
+            match = re.match(r'^(#{1,2})\s+(.+)$', line)
+            if not match:
+                continue
+            if len(match.group(1)) == 1 and not title:
+                title = match.group(2).strip()
+            elif len(match.group(1)) == 2:
+                sections.append(match.group(2).strip())
+        return title or (sections[0] if sections else ''), sections
+    
+    def _merge_sections(self, title, sections, bodies):
+        """
+        合并各小节，去掉模型可能重复输出的小节标题
+        """
+        parts = [f"# {title}"]
+        for section, body in zip(sections, bodies):
+            body = body.strip()
+            first_line = body.split('\n', 1)[0]
+            if first_line.lstrip().startswith('#') and section in first_line:
+                body = body[len(first_line):].strip()
+            parts.append(f"## {section}")
+            parts.append(body)
+        return '\n\n'.join(parts)
+    
     def _create_prompt(self, requirements, word_count):
         return f"""请生成一篇符合以下要求的SEO文章：
         要求：{requirements}
@@ -98,4 +561,160 @@ class ArticleGenerator:
         3. 适合配图的内容布局
         4. 关键词密度保持在2%-3%
         5. 标题和段落层次分明
-        """
\ No newline at end of file
+        """
+
+
+class AsyncArticleGenerator(ArticleGenerator):
+    """
+    异步文章生成器，用于批量模式下同时保持多个生成请求
+    generate 和 generate_sectioned 为协程，不支持流式生成
+    """
+    def _create_client(self, endpoint):
+        return get_openai_client(endpoint.base_url, endpoint.api_key, async_client=True)
+    
+    async def generate(self, requirements, word_count, max_retries=5, retry_delay=3, use_cache=True):
+        """
+        异步生成文章内容，重试策略与同步版本一致
+        :param requirements: 文章要求
+        :param word_count: 字数要求
+        :param max_retries: 最大重试次数
+        :param retry_delay: 重试间隔（秒）
+        :param use_cache: 是否使用缓存，为False时强制重新生成
+        :return: 生成的文章内容
+        """
+        # 并发任务共用一个实例，耗时统计不写入 self.last_metrics
+        return await self._complete_async(self._create_prompt(requirements, word_count), word_count,
+                                          GenerationMetrics(started_at=time.monotonic()),
+                                          max_retries, retry_delay, use_cache)
+    
+    async def generate_sectioned(self, requirements, word_count, max_workers=None, use_cache=True):
+        """
+        异步长文生成：先生成大纲，再同时生成各个二级标题小节，合并方式与同步版本一致
+        :param requirements: 文章要求
+        :param word_count: 字数要求
+        :param max_workers: 同时生成的小节数，默认全部小节同时生成
+        :param use_cache: 是否使用缓存，为False时强制重新生成
+        :return: 生成的文章内容
+        """
+        started = time.monotonic()
+        section_count = self._section_count(word_count)
+        outline = await self._complete_async(
+            self._create_outline_prompt(requirements, word_count, section_count),
+            section_count * 30,
+            GenerationMetrics(started_at=time.monotonic()),
+            use_cache=use_cache
+        )
+        title, sections = self._parse_outline(outline)
+        if not sections:
+            self.logger.warning("大纲解析失败，改为整篇生成")
+            return await self.generate(requirements, word_count, use_cache=use_cache)
+        
+        self.logger.info(f"大纲生成完成，共{len(sections)}个小节，开始并发生成")
+        section_words = max(200, word_count // len(sections))
+        semaphore = asyncio.Semaphore(max_workers or len(sections))
+        
+        async def section(index):
+            async with semaphore:
+                return await self._complete_async(
+                    self._create_section_prompt(requirements, title, sections, index, section_words),
+                    section_words,
+                    GenerationMetrics(started_at=time.monotonic()),
+                    use_cache=use_cache
+                )
+        
+        bodies = await asyncio.gather(*(section(index) for index in range(len(sections))))
+        self.logger.info(f"分段生成完成，总耗时{time.monotonic() - started:.2f}秒")
+        return self._merge_sections(title, sections, bodies)
+    
+    def generate_stream(self, *args, **kwargs):
+        """
+        异步生成器不支持流式生成（继承的同步实现会拿到未等待的协程），请使用 ArticleGenerator
+        """
+        raise NotImplementedError("AsyncArticleGenerator 不支持流式生成，请使用 ArticleGenerator.generate_stream")
+    
+    async def _complete_async(self, prompt, word_count, metrics, max_retries=5, retry_delay=3, use_cache=True):
+        """
+        _complete 的异步版本：发送单次chat completion请求（含缓存、限流和重试），返回去除推理过程后的正文
+        """
+        cache_key = self._cache_key(prompt)
+        cached = self._cache_get(cache_key, use_cache)
+        if cached is not None:
+            return cached
+        
+        max_tokens = None
+        for attempt in range(max_retries):
+            request = self._build_request(prompt, max_tokens=max_tokens or self.budget_planner.plan(word_count))
+            estimated_tokens = self._estimate_tokens(request)
+            await self.rate_limiter.acquire_async(estimated_tokens)
+            used_tokens = 0  # 请求失败时退回全部预留的额度
+            try:
+                self.logger.info(f"尝试生成文章，第{attempt + 1}次尝试")
+                response = await self._hedged_create_async(request, estimated_tokens)
+                self.logger.info("文章生成成功")
+                used_tokens = self._used_tokens(response)
+                content = self._finish_response(response, request['max_tokens'], metrics)
+                if metrics.truncated and max_tokens is None and attempt < max_retries - 1:
+                    max_tokens = self._truncation_retry_budget(request['max_tokens'])
+                    if max_tokens:
+                        continue
+                self._cache_put(cache_key, content, metrics)
+                return content
+                
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, max_retries, retry_delay)
+            finally:
+                self.rate_limiter.settle(estimated_tokens, used_tokens)
+            await asyncio.sleep(delay)
+                
+        raise Exception('达到最大重试次数，请稍后重试')
+    
+    async def _hedged_create_async(self, request, estimated_tokens):
+        """
+        异步对冲请求：取先完成的结果，并取消落后的请求
+        """
+        endpoints = self.endpoint_pool.ranked()
+        primary = endpoints[0]
+        delay = self.endpoint_pool.hedge_delay(primary, request['max_tokens'])
+        if delay is None:
+            return await self._send_async(primary, request)
+        
+        tasks = [asyncio.create_task(self._send_async(primary, request))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done and self.rate_limiter.try_acquire(estimated_tokens):
+                self.logger.info(f"主请求超过{delay:.1f}秒未完成，向 {endpoints[1].name} 发起对冲请求")
+                tasks.append(asyncio.create_task(self._send_async(endpoints[1], request)))
+            
+            errors = []
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        errors.append(task.exception())
+                        continue
+                    # 胜出请求的用量由调用方修正，落后的请求被取消后退回对冲预留的额度
+                    for other in tasks:
+                        if other is not task:
+                            other.add_done_callback(
+                                lambda abandoned: self._settle_abandoned(abandoned, estimated_tokens))
+                    return task.result()
+            # 全部失败：退回对冲请求预留的额度，主请求的额度由调用方退回
+            for _ in tasks[1:]:
+                self.rate_limiter.settle(estimated_tokens, 0)
+            raise errors[0]
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    async def _send_async(self, endpoint, request):
+        started = time.monotonic()
+        try:
+            response = await self._client_for(endpoint).chat.completions.create(
+                **dict(request, model=endpoint.model)
+            )
+        except Exception:
+            self.endpoint_pool.record_failure(endpoint)
+            raise
+        self.endpoint_pool.record_success(endpoint, time.monotonic() - started, request['max_tokens'])
+        return response
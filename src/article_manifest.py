@@ -0,0 +1,117 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Callable, List, Optional
+from utils.cache import DiskCache
+from utils.config import Config
+from utils.segmenter import get_segmenter
+
+class ArticleManifest:
+    """
+    文章清单：按段落内容哈希记录一篇文章的派生结果
+    （段落分词结果、关键词调整后的段落、配图和文档），
+    编辑修改文章后重新发布时，内容未变化的段落直接复用上次的结果，只处理变化的部分
+    清单按文章名保存在缓存目录的 manifests 子目录，保存时只保留本次用到的条目
+    """
+    SECTIONS = ('tokens', 'adjusted', 'images', 'document')
+
+    # 进程内共享的清单缓存，避免每篇文章重复扫描缓存目录
+    _cache = None
+    _cache_lock = threading.Lock()
+
+    def __init__(self, name: str):
+        """
+        :param name: 文章名，与 DocumentWriter.create_document 的 name 参数一致
+        """
+        self.name = name
+        self.logger = logging.getLogger(__name__)
+        self.key = DiskCache.make_key('manifest', name)
+        self.hits = 0
+        self.misses = 0
+
+        self._segmenter = get_segmenter().fingerprint()
+        self._previous = {section: {} for section in self.SECTIONS}
+        self._current = {section: {} for section in self.SECTIONS}
+        self._load()
+
+    @staticmethod
+    def paragraph_hash(text: str) -> str:
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+    def get(self, section: str, key: str):
+        """
+        读取上次运行的结果，命中时保留到本次的清单中
+        :return: 结果，未命中时返回None
+        """
+        value = self._previous[section].get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._current[section][key] = value
+        self.hits += 1
+        return value
+
+    def put(self, section: str, key: str, value):
+        self._current[section][key] = value
+
+    def tokens(self, text: str, tokenize: Callable[[str], List[str]]) -> List[str]:
+        """
+        段落的分词结果，段落内容未变化时不再分词
+        """
+        key = self.paragraph_hash(text)
+        cached = self.get('tokens', key)
+        if cached is not None:
+            return cached.split(' ') if cached else []
+        tokens = tokenize(text)
+        # 词语中不含空白，以空格连接保存，比JSON数组紧凑
+        self.put('tokens', key, ' '.join(tokens))
+        return tokens
+
+    def path(self, section: str, key: str) -> Optional[str]:
+        """
+        读取上次生成的文件路径（配图、文档），文件已被删除时视为未命中
+        """
+        if not os.path.exists(self._previous[section].get(key, '')):
+            self._previous[section].pop(key, None)
+        return self.get(section, key)
+
+    def save(self):
+        """
+        保存本次用到的条目，本次没有执行的步骤（例如未生成配图）保留上次的结果
+        """
+        sections = {
+            section: self._current[section] or self._previous[section]
+            for section in self.SECTIONS
+        }
+        data = {'name': self.name, 'segmenter': self._segmenter, 'sections': sections}
+        self._get_cache().put_text(self.key, json.dumps(data, ensure_ascii=False))
+        self.logger.info(f"文章清单已保存：{self.name}（复用{self.hits}项，重新处理{self.misses}项）")
+
+    def _load(self):
+        text = self._get_cache().get_text(self.key)
+        if text is None:
+            return
+        try:
+            data = json.loads(text)
+            for section in self.SECTIONS:
+                self._previous[section] = data['sections'].get(section, {})
+        except (ValueError, KeyError, AttributeError):
+            self.logger.warning(f"文章清单损坏，将重新处理全文：{self.name}")
+            self._previous = {section: {} for section in self.SECTIONS}
+            return
+        # 分词词典变化后分词结果失效
+        if data.get('segmenter') != self._segmenter:
+            self._previous['tokens'] = {}
+
+    @classmethod
+    def _get_cache(cls):
+        with cls._cache_lock:
+            if cls._cache is None:
+                cls._cache = DiskCache(
+                    'manifests',
+                    max_bytes=Config().get('article_manifest_max_mb', 256) * 1024 * 1024,
+                    suffix='.json'
+                )
+            return cls._cache
@@ -0,0 +1,266 @@
+import asyncio
+import csv
+import logging
+import os
+import time
+from datetime import datetime
+from article_generator import AsyncArticleGenerator
+from article_manifest import ArticleManifest
+from image_generator import ImageGenerator
+from seo_optimizer import SEOOptimizer
+from document_writer import DocumentWriter
+from duplicate_index import DuplicateIndex
+from image_processing import create_process_pool
+from link_index import RelatedArticleIndex
+from utils.config import Config
+
+class BatchRunner:
+    """
+    批量生成文章：读取关键词文件，按并发上限同时发起多个生成请求，
+    每篇文章完成后立即写入结果文件
+    """
+    RESULT_FIELDS = ['index', 'requirements', 'word_count', 'status',
+                     'doc_path', 'doc_kb', 'image_count', 'duplicate_of', 'similarity', 'elapsed', 'error']
+
+    def __init__(self, concurrency=None, watermark_text="", with_images=True, use_cache=True):
+        self.config = Config()
+        self.logger = logging.getLogger(__name__)
+        self.concurrency = concurrency or self.config.get('batch_concurrency', 8)
+        self.watermark_text = watermark_text
+        self.with_images = with_images
+        self.use_cache = use_cache
+        self.output_dir = self.config.get('output_dir', 'output')
+        # 为每篇文章保存段落清单，之后重新发布修改过的文章时只处理变化的段落
+        self.use_manifest = self.config.get('article_manifest', True)
+        # 近似重复检查：重复时重新生成（regenerate）或只在结果文件中标记（flag）
+        self.duplicate_policy = self.config.get('duplicate_policy', 'flag')
+        self.duplicate_max_retries = self.config.get('duplicate_max_retries', 2)
+        self.duplicate_index = DuplicateIndex() if self.config.get('duplicate_check', True) else None
+        # 站内链接：SEO优化后插入已生成文章中最相关的几篇
+        self.link_index = self._load_link_index()
+
+        # 水印、缩放等CPU密集的图片处理放到进程池，网络请求留在协程和线程中
+        self.process_pool = create_process_pool()
+
+        # 生成器在整个批次内复用
+        self.article_gen = AsyncArticleGenerator()
+        self.seo_opt = SEOOptimizer(idf_weights=self._load_idf_weights())
+        self.image_gen = ImageGenerator(process_pool=self.process_pool) if with_images else None
+        self.doc_writer = DocumentWriter(process_pool=self.process_pool)
+
+    def _load_idf_weights(self):
+        """
+        配置项 corpus_aware_keywords 开启时，根据已生成文章的语料索引选取关键词
+        IDF只在批量开始时计算一次，本批次新生成的文章不计入
+        """
+        if not self.config.get('corpus_aware_keywords', False):
+            return None
+        from corpus_analytics import CorpusIndex
+        corpus = CorpusIndex()
+        corpus.update(self.output_dir)
+        return corpus.idf_weights() or None
+
+    def _load_link_index(self):
+        """
+        配置项 internal_links 开启时（默认开启），加载相关文章索引并同步输出目录中的文章
+        """
+        if not self.config.get('internal_links', True):
+            return None
+        link_index = RelatedArticleIndex()
+        link_index.update(self.output_dir)
+        return link_index
+
+    @staticmethod
+    def load_jobs(path, default_word_count=1000):
+        """
+        读取关键词文件
+        支持CSV（含表头，列名 requirements 或 keyword，可选 word_count）
+        以及纯文本（每行一个关键词/要求）
+        :param path: 关键词文件路径
+        :param default_word_count: 未指定字数时的默认字数
+        :return: 任务列表
+        """
+        jobs = []
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            if path.lower().endswith('.csv'):
+                for row in csv.DictReader(f):
+                    requirements = (row.get('requirements') or row.get('keyword') or '').strip()
+                    if not requirements:
+                        continue
+                    word_count = (row.get('word_count') or '').strip()
+                    jobs.append({
+                        'requirements': requirements,
+                        'word_count': int(word_count) if word_count else default_word_count
+                    })
+            else:
+                for line in f:
+                    if line.strip():
+                        jobs.append({
+                            'requirements': line.strip(),
+                            'word_count': default_word_count
+                        })
+        return jobs
+
+    def close(self):
+        """
+        关闭图片处理进程池
+        """
+        if self.process_pool is not None:
+            self.process_pool.shutdown()
+            self.process_pool = None
+
+    def run(self, jobs):
+        """
+        同步入口，执行整个批次
+        :param jobs: 任务列表
+        :return: 结果文件路径
+        """
+        return asyncio.run(self.run_async(jobs))
+
+    async def run_async(self, jobs):
+        os.makedirs(self.output_dir, exist_ok=True)
+        batch_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        result_path = os.path.join(self.output_dir, f'batch_{batch_id}.csv')
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        self.logger.info(f"开始批量生成：共{len(jobs)}篇，并发数{self.concurrency}")
+        started = time.monotonic()
+        succeeded = 0
+
+        with open(result_path, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=self.RESULT_FIELDS)
+            writer.writeheader()
+
+            tasks = [
+                asyncio.create_task(self._run_job(semaphore, batch_id, index, job))
+                for index, job in enumerate(jobs)
+            ]
+            for finished in asyncio.as_completed(tasks):
+                result = await finished
+                writer.writerow(result)
+                f.flush()
+                if result['status'] == 'success':
+                    succeeded += 1
+                print(f"[{succeeded}/{len(jobs)}] {result['status']}: {result['requirements']}")
+
+        if self.duplicate_index is not None:
+            await asyncio.to_thread(self.duplicate_index.save)
+        if self.link_index is not None:
+            await asyncio.to_thread(self.link_index.save)
+
+        elapsed = time.monotonic() - started
+        self.logger.info(f"批量生成完成：成功{succeeded}/{len(jobs)}篇，耗时{elapsed:.1f}秒")
+        stats = self.article_gen.cache.stats()
+        self.logger.info(f"文章缓存：命中{stats['hits']}次，未命中{stats['misses']}次")
+        return result_path
+
+    async def _generate_unique(self, name, job):
+        """
+        生成文章并与已生成的文章及本批次正在处理的文章查重，近似重复时按 duplicate_policy 重新生成或只做标记
+        采用的文章在索引中预留，文档生成成功后才写入索引，失败时取消预留，重试时从缓存取回的同一篇文章不会与自己重复
+        :return: (文章内容, 重复时为(最相似的文章名, 相似度)，否则为None)
+        """
+        retries = self.duplicate_max_retries if self.duplicate_policy == 'regenerate' else 0
+        use_cache = self.use_cache
+        # 字数达到 sectioned_min_words 时先生成大纲再同时生成各小节
+        if self.article_gen.should_use_sections(job['word_count']):
+            generate = self.article_gen.generate_sectioned
+        else:
+            generate = self.article_gen.generate
+        for attempt in range(retries + 1):
+            article_content = await generate(
+                job['requirements'],
+                job['word_count'],
+                use_cache=use_cache
+            )
+            if self.duplicate_index is None:
+                return article_content, None
+
+            # 最后一次仍然重复时也预留，文章照常发布
+            final = attempt == retries
+            duplicate = await asyncio.to_thread(self.duplicate_index.reserve, name, article_content, final)
+            if duplicate is None:
+                return article_content, None
+            self.logger.warning(
+                f"文章与已有文章近似重复：{name} ≈ {duplicate[0]}（相似度{duplicate[1]}）"
+                + ("" if final else f"，重新生成（第{attempt + 1}次）")
+            )
+            use_cache = False
+        return article_content, duplicate
+
+    async def _run_job(self, semaphore, batch_id, index, job):
+        """
+        执行单个任务，异常不向外抛出，记录到结果行中
+        """
+        result = {
+            'index': index,
+            'requirements': job['requirements'],
+            'word_count': job['word_count'],
+            'status': 'success',
+            'doc_path': '',
+            'doc_kb': 0,
+            'image_count': 0,
+            'duplicate_of': '',
+            'similarity': '',
+            'elapsed': 0,
+            'error': ''
+        }
+        started = time.monotonic()
+
+        try:
+            name = f"{batch_id}_{index:04d}"
+            # 只有文章生成请求占用并发名额，下游处理不阻塞后续请求
+            async with semaphore:
+                article_content, duplicate = await self._generate_unique(name, job)
+            if duplicate:
+                result['duplicate_of'], result['similarity'] = duplicate
+
+            manifest = ArticleManifest(name) if self.use_manifest else None
+            optimized_content = await asyncio.to_thread(
+                self.seo_opt.optimize, article_content, manifest
+            )
+            if self.link_index is not None:
+                optimized_content = await asyncio.to_thread(
+                    self.link_index.add_links, optimized_content, name
+                )
+
+            image_paths = []
+            if self.image_gen:
+                image_paths = await asyncio.to_thread(
+                    self.image_gen.generate,
+                    optimized_content,
+                    "",
+                    self.watermark_text,
+                    "bottom-right",
+                    manifest
+                )
+
+            result['doc_path'] = await asyncio.to_thread(
+                self.doc_writer.create_document,
+                optimized_content,
+                image_paths,
+                name,
+                manifest,
+                article_content
+            )
+            if manifest is not None:
+                await asyncio.to_thread(manifest.save)
+            if self.duplicate_index is not None:
+                self.duplicate_index.commit(name)
+            if self.link_index is not None:
+                # 加入索引后，之后生成的文章可以链接到它
+                await asyncio.to_thread(
+                    self.link_index.add_document, name, optimized_content, result['doc_path']
+                )
+            result['doc_kb'] = round(os.path.getsize(result['doc_path']) / 1024)
+            result['image_count'] = len(image_paths)
+
+        except Exception as e:
+            if self.duplicate_index is not None:
+                self.duplicate_index.release(name)
+            self.logger.error(f"第{index + 1}篇生成失败: {str(e)}")
+            result['status'] = 'failed'
+            result['error'] = str(e)
+
+        result['elapsed'] = round(time.monotonic() - started, 2)
+        return result
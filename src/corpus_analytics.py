@@ -0,0 +1,252 @@
+import csv
+import json
+import logging
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+import scipy.sparse as sp
+from link_index import strip_related
+from utils.config import Config
+from utils.segmenter import STOP_WORDS, get_segmenter
+
+def count_terms(path):
+    """
+    统计一篇文章的词频（模块级函数，可提交到进程池）
+    :return: (文章总词数, {词: 次数})，只保留长度大于1且不是常用虚词的词，文末的相关阅读小节不计入
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        words = get_segmenter().cut(strip_related(f.read()).lower())
+    counts = Counter(word for word in words if len(word) > 1 and word not in STOP_WORDS)
+    return len(words), counts
+
+
+class CorpusIndex:
+    """
+    语料库关键词分析：以稀疏矩阵保存所有已生成文章的词频（行为文章，列为词），
+    计算TF-IDF、关键词密度分布以及关键词蚕食（多篇文章主打同一关键词）报告
+    索引保存在缓存目录，每次只分析新增或修改过的文章
+    """
+    def __init__(self, index_dir=None):
+        self.config = Config()
+        self.logger = logging.getLogger(__name__)
+        self.index_dir = Path(index_dir or Path(self.config.get('cache_dir', 'cache')) / 'corpus')
+        self.workers = self.config.get('corpus_workers', os.cpu_count() or 1)
+
+        self.terms = []  # 列序号 -> 词
+        self.term_ids = {}  # 词 -> 列序号
+        self.docs = []  # 行序号 -> {'path', 'mtime', 'length'}
+        self.matrix = sp.csr_matrix((0, 0), dtype=np.float32)
+        self._load()
+
+    def update(self, output_dir=None):
+        """
+        扫描输出目录中的文章（docx旁的.md正文），更新索引
+        :return: 新增或更新的文章数
+        """
+        output_dir = Path(output_dir or self.config.get('output_dir', 'output'))
+        # .source.md 是SEO优化前的原文，只统计发布的正文
+        current = {str(path): path.stat().st_mtime for path in sorted(output_dir.glob('article_*.md'))
+                   if not path.name.endswith('.source.md')}
+
+        keep = [row for row, doc in enumerate(self.docs) if current.get(doc['path']) == doc['mtime']]
+        known = {self.docs[row]['path'] for row in keep}
+        pending = [path for path in current if path not in known]
+        if len(keep) == len(self.docs) and not pending:
+            return 0
+
+        self.docs = [self.docs[row] for row in keep]
+        self.matrix = self.matrix[keep]
+        if pending:
+            self._append(pending, current)
+        self._save()
+        self.logger.info(f"语料索引已更新：新增/更新{len(pending)}篇，共{len(self.docs)}篇，{len(self.terms)}个词")
+        return len(pending)
+
+    def _append(self, paths, mtimes):
+        """
+        分析新文章并追加到矩阵末尾
+        """
+        if self.workers and self.workers > 1 and len(paths) > 100:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                results = list(pool.map(count_terms, paths, chunksize=64))
+        else:
+            results = [count_terms(path) for path in paths]
+
+        indptr = [0]
+        indices = []
+        data = []
+        for path, (length, counts) in zip(paths, results):
+            for term, count in counts.items():
+                term_id = self.term_ids.get(term)
+                if term_id is None:
+                    term_id = self.term_ids[term] = len(self.terms)
+                    self.terms.append(term)
+                indices.append(term_id)
+                data.append(count)
+            indptr.append(len(indices))
+            self.docs.append({'path': path, 'mtime': mtimes[path], 'length': length})
+
+        shape = (len(paths), len(self.terms))
+        rows = sp.csr_matrix((np.array(data, dtype=np.float32), np.array(indices, dtype=np.int32),
+                              np.array(indptr, dtype=np.int64)), shape=shape)
+        self.matrix.resize((self.matrix.shape[0], len(self.terms)))
+        self.matrix = sp.vstack([self.matrix, rows], format='csr')
+
+    def document_frequency(self):
+        """
+        每个词出现在多少篇文章中
+        """
+        return np.asarray(self.matrix.getnnz(axis=0))
+
+    def idf(self):
+        """
+        平滑的逆文档频率：log((1+N)/(1+df)) + 1
+        """
+        return np.log((1 + len(self.docs)) / (1 + self.document_frequency())) + 1
+
+    def idf_weights(self):
+        """
+        以字典形式返回各词的IDF，供 SEOOptimizer 选取关键词时使用
+        """
+        return dict(zip(self.terms, self.idf().tolist()))
+
+    def tfidf(self, exclude=None):
+        """
+        TF-IDF矩阵（词频按文章总词数归一化，每行再做L2归一化）
+        :param exclude: 可选，按词的布尔数组，为True的词在归一化之前去掉
+        """
+        lengths = np.maximum(np.array([doc['length'] for doc in self.docs], dtype=np.float32), 1)
+        idf = self.idf().astype(np.float32)
+        if exclude is not None:
+            idf[exclude] = 0
+        weighted = (sp.diags(1 / lengths) @ self.matrix @ sp.diags(idf)).tocsr()
+        weighted.eliminate_zeros()
+        norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+        return sp.diags(1 / np.maximum(norms, 1e-12)) @ weighted
+
+    def keyword_report(self, top=100):
+        """
+        按出现文章数排序的关键词统计及其在各文章中的密度分布（%）
+        """
+        if not self.docs:
+            return []
+        df = self.document_frequency()
+        totals = np.asarray(self.matrix.sum(axis=0)).ravel()
+        lengths = np.maximum(np.array([doc['length'] for doc in self.docs], dtype=np.float32), 1)
+        densities = (sp.diags(100 / lengths) @ self.matrix).tocsc()
+
+        # 文章被删除后残留的词（出现文章数为0）不参与排名
+        ranked = np.argsort(-df, kind='stable')
+        ranked = ranked[df[ranked] > 0][:top]
+        report = []
+        for term_id in ranked:
+            values = densities.data[densities.indptr[term_id]:densities.indptr[term_id + 1]]
+            report.append({
+                'keyword': self.terms[term_id],
+                'documents': int(df[term_id]),
+                'document_ratio': round(float(df[term_id]) / len(self.docs), 4),
+                'occurrences': int(totals[term_id]),
+                'density_mean': round(float(values.mean()), 3),
+                'density_p50': round(float(np.percentile(values, 50)), 3),
+                'density_p90': round(float(np.percentile(values, 90)), 3),
+                'density_max': round(float(values.max()), 3)
+            })
+        return report
+
+    def cannibalization_report(self, min_documents=2):
+        """
+        按每篇文章TF-IDF最高的词（主关键词）分组，列出多篇文章争抢同一关键词的情况
+        """
+        if not self.docs or not self.terms:
+            return []
+        primary = np.asarray(self.tfidf().argmax(axis=1)).ravel()
+        groups = {}
+        for row, term_id in enumerate(primary):
+            groups.setdefault(int(term_id), []).append(self.docs[row]['path'])
+        report = [
+            {'keyword': self.terms[term_id], 'documents': len(paths), 'articles': paths}
+            for term_id, paths in groups.items() if len(paths) >= min_documents
+        ]
+        return sorted(report, key=lambda item: -item['documents'])
+
+    def overlap_report(self, threshold=None, chunk_size=2000):
+        """
+        TF-IDF余弦相似度达到阈值的文章对，分块计算稀疏矩阵乘积以控制内存
+        超过一半文章都使用的词不参与比较（去掉后再归一化），避免乘积矩阵过于稠密
+        """
+        if threshold is None:
+            threshold = self.config.get('corpus_overlap_threshold', 0.8)
+        if not self.docs:
+            return []
+        common = self.document_frequency() > len(self.docs) * self.config.get('corpus_overlap_max_df', 0.5)
+        tfidf = self.tfidf(common).tocsr()
+        transposed = tfidf.T.tocsc()
+        pairs = []
+        for start in range(0, tfidf.shape[0], chunk_size):
+            block = (tfidf[start:start + chunk_size] @ transposed).tocoo()
+            mask = (block.data >= threshold) & (block.row + start < block.col)
+            for row, col, score in zip(block.row[mask], block.col[mask], block.data[mask]):
+                pairs.append((self.docs[row + start]['path'], self.docs[col]['path'], round(float(score), 4)))
+        return sorted(pairs, key=lambda pair: -pair[2])
+
+    def write_reports(self, report_dir=None):
+        """
+        将关键词统计、关键词蚕食和相似文章报告写入CSV
+        :return: 报告文件路径列表
+        """
+        report_dir = Path(report_dir or self.config.get('output_dir', 'output'))
+        report_dir.mkdir(parents=True, exist_ok=True)
+        paths = []
+
+        keyword_path = report_dir / 'corpus_keywords.csv'
+        rows = self.keyword_report(self.config.get('corpus_report_top', 100))
+        with open(keyword_path, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['keyword', 'documents', 'document_ratio', 'occurrences',
+                                                   'density_mean', 'density_p50', 'density_p90', 'density_max'])
+            writer.writeheader()
+            writer.writerows(rows)
+        paths.append(keyword_path)
+
+        cannibalization_path = report_dir / 'corpus_cannibalization.csv'
+        with open(cannibalization_path, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['keyword', 'documents', 'articles'])
+            for item in self.cannibalization_report():
+                writer.writerow([item['keyword'], item['documents'], ';'.join(item['articles'])])
+        paths.append(cannibalization_path)
+
+        overlap_path = report_dir / 'corpus_overlap.csv'
+        with open(overlap_path, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['article_a', 'article_b', 'similarity'])
+            writer.writerows(self.overlap_report())
+        paths.append(overlap_path)
+
+        return paths
+
+    def _load(self):
+        try:
+            with open(self.index_dir / 'index.json', 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            matrix = sp.load_npz(self.index_dir / 'matrix.npz').tocsr()
+        except (OSError, ValueError, KeyError):
+            return
+        if matrix.shape != (len(state['docs']), len(state['terms'])):
+            self.logger.warning("语料索引不一致，将重新建立")
+            return
+        self.terms = state['terms']
+        self.term_ids = {term: i for i, term in enumerate(self.terms)}
+        self.docs = state['docs']
+        self.matrix = matrix
+
+    def _save(self):
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        tmp_matrix = self.index_dir / f'matrix.{os.getpid()}.tmp.npz'
+        sp.save_npz(tmp_matrix, self.matrix)
+        tmp_index = self.index_dir / f'index.{os.getpid()}.tmp'
+        with open(tmp_index, 'w', encoding='utf-8') as f:
+            json.dump({'terms': self.terms, 'docs': self.docs}, f, ensure_ascii=False)
+        os.replace(tmp_matrix, self.index_dir / 'matrix.npz')
+        os.replace(tmp_index, self.index_dir / 'index.json')
@@ -1,31 +1,110 @@
 from docx import Document
 from docx.shared import Inches, Pt, RGBColor
+from docx.enum.style import WD_STYLE_TYPE
 from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.image.image import Image as DocxImage
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.opc.packuri import PackURI
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.oxml.shape import CT_Inline
+from docx.parts.image import ImagePart
+from docx.text.paragraph import Paragraph
 from utils.config import Config
+from utils.cache import DiskCache
+from image_processing import file_digest, resize_for_document, run_in_pool
+from seo_optimizer import strip_meta_tags
+from io import BytesIO
+import copy
 import os
+import re
+import json
 import logging
+import threading
+import zipfile
 from datetime import datetime
 
 class DocumentWriter:
-    def __init__(self):
+    IMAGE_WIDTH = 6.0  # 图片在文档中的显示宽度（英寸）
+    
+    # 默认样式，可通过配置项 docx_styles 按样式名覆盖（例如 {"Normal": {"size": 11}}）
+    DEFAULT_STYLES = {
+        'Normal': {'font': '微软雅黑', 'size': 12},
+        'Heading 1': {'font': '微软雅黑', 'size': 18, 'bold': True, 'color': '000000'},
+        'Heading 2': {'font': '微软雅黑', 'size': 16, 'bold': True, 'color': '000000'},
+        'Heading 3': {'font': '微软雅黑', 'size': 14, 'bold': True, 'color': '000000'},
+        'Caption': {'font': '微软雅黑', 'size': 10, 'italic': True, 'color': '595959'}
+    }
+    # 文档中用到的样式，精简模板时保留
+    USED_STYLES = ('Normal', 'Title', 'Heading 1', 'Heading 2', 'Heading 3', 'Caption')
+    TEMPLATE_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.template.main+xml'
+    DOCUMENT_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml'
+    STYLES_WITH_EFFECTS = 'http://schemas.microsoft.com/office/2007/relationships/stylesWithEffects'
+    SOURCE_SUFFIX = '.source.md'  # SEO优化前原文的文件后缀，与docx同名
+    
+    # 进程内共享的已设置好样式的模板（docx文件内容），每篇文档从中复制，不再重复解析默认模板和设置样式
+    _templates = {}
+    _templates_lock = threading.Lock()
+    
+    def __init__(self, process_pool=None):
+        """
+        :param process_pool: 可选，图片压缩使用的进程池（批量模式），默认在当前线程处理
+        """
         self.config = Config()
         self.logger = logging.getLogger(__name__)
         self.output_dir = self.config.get('output_dir', 'output')
+        self.process_pool = process_pool
+        # 在docx旁保存一份Markdown正文，供语料分析使用
+        self.save_markdown = self.config.get('save_markdown', True)
         
-    def create_document(self, content, image_paths):
+        # 嵌入前按显示宽度和DPI缩小并转为JPEG，原图保持不变，处理结果缓存复用
+        self.optimize_images = self.config.get('docx_image_optimize', True)
+        self.image_dpi = self.config.get('docx_image_dpi', 150)
+        self.image_quality = self.config.get('docx_image_quality', 85)
+        self.image_cache = DiskCache(
+            'docx_images',
+            max_bytes=self.config.get('docx_image_cache_max_mb', 256) * 1024 * 1024,
+            suffix='.jpg'
+        )
+        
+        # 可选的Word模板（.docx/.dotx），未配置时使用python-docx默认模板和 DEFAULT_STYLES
+        self.template_path = self.config.get('docx_template')
+        self.styles = self.config.get('docx_styles') or {}
+        # 精简模板：只保留用到的样式，文档打开和生成都更快
+        self.prune_styles = self.config.get('docx_prune_styles', True)
+        
+    def create_document(self, content, image_paths, name=None, manifest=None, source=None):
         """
         创建Word文档并添加内容和图片
         :param content: 文章内容
         :param image_paths: 图片路径列表
+        :param name: 文件名标识，默认使用时间戳（批量模式下需保证唯一）
+        :param manifest: 可选，ArticleManifest，内容和图片都没有变化时直接使用上次生成的文档
+        :param source: 可选，SEO优化前的原文，提供时另存为 .source.md（重新发布时从原文重新优化，结果与首次发布一致），
+                       .md 正文始终是发布的内容，供语料分析、查重和内链索引使用
         :return: 生成的文档路径
         """
         try:
-            doc = Document()
+            key = None
+            if manifest is not None and name is not None:
+                key = DiskCache.make_key(
+                    content, source, name, self.output_dir,
+                    [file_digest(path) if os.path.exists(path) else path for path in image_paths],
+                    self.IMAGE_WIDTH, self.optimize_images, self.image_dpi, self.image_quality,
+                    self._template_key()
+                )
+                filename = manifest.path('document', key)
+                if filename:
+                    self.logger.info(f"文章内容和配图均未变化，沿用已有文档: {filename}")
+                    return filename
             
-            # 设置文档样式
-            self._set_document_style(doc)
+            # 从已设置好样式的模板复制
+            doc = Document(BytesIO(self._template()))
             
             # 处理文章内容和图片
+            original_bytes = sum(os.path.getsize(path) for path in image_paths if os.path.exists(path))
+            image_paths = self._prepare_images(image_paths)
+            embedded_bytes = sum(os.path.getsize(path) for path in image_paths if os.path.exists(path))
             self._add_content_with_images(doc, content, image_paths)
             
             # 保存文档
@@ -33,11 +112,23 @@ class DocumentWriter:
                 os.makedirs(self.output_dir)
                 
             # 使用时间戳生成文件名
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = os.path.join(self.output_dir, f'article_{timestamp}.docx')
+            if name is None:
+                name = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filename = os.path.join(self.output_dir, f'article_{name}.docx')
             doc.save(filename)
+            if self.save_markdown:
+                with open(os.path.splitext(filename)[0] + '.md', 'w', encoding='utf-8') as f:
+                    f.write(self._remove_meta_tags(content).lstrip('\n'))
+                if source is not None:
+                    with open(os.path.splitext(filename)[0] + self.SOURCE_SUFFIX, 'w', encoding='utf-8') as f:
+                        f.write(source)
+            if key is not None:
+                manifest.put('document', key, filename)
             
-            self.logger.info(f"文档已保存到: {filename}")
+            self.logger.info(
+                f"文档已保存到: {filename}（{os.path.getsize(filename) / 1024:.0f}KB，"
+                f"图片{len(image_paths)}张：原图{original_bytes / 1024:.0f}KB，嵌入{embedded_bytes / 1024:.0f}KB）"
+            )
             return filename
             
         except Exception as e:
@@ -45,32 +136,209 @@ class DocumentWriter:
             self.logger.error(error_msg)
             raise Exception(error_msg)
     
-    def _set_document_style(self, doc):
+    def _prepare_images(self, image_paths):
         """
-        设置文档的基本样式
+        将图片缩小到文档显示尺寸并重新编码，处理失败时使用原图
+        python-docx不支持嵌入WebP，因此统一输出JPEG
+        :return: 实际嵌入的图片路径列表
         """
-        # 设置默认字体
-        style = doc.styles['Normal']
-        style.font.name = '微软雅黑'
-        style.font.size = Pt(12)
+        if not self.optimize_images:
+            return image_paths
         
-        # 设置标题样式
-        for i in range(1, 4):  # h1 to h3
-            style = doc.styles[f'Heading {i}']
-            style.font.name = '微软雅黑'
-            style.font.size = Pt(20 - i * 2)  # h1: 18pt, h2: 16pt, h3: 14pt
-            style.font.bold = True
-            style.font.color.rgb = RGBColor(0, 0, 0)
-            
-        # 设置图片说明样式
-        if 'Caption' not in doc.styles:
-            style = doc.styles.add_style('Caption', 1)
+        max_width = int(self.IMAGE_WIDTH * self.image_dpi)
+        prepared = []
+        for path in image_paths:
+            if not os.path.exists(path):
+                prepared.append(path)
+                continue
+            try:
+                key = DiskCache.make_key(file_digest(path), max_width, self.image_quality)
+                cached_path = self.image_cache.get_path(key)
+                if cached_path is None:
+                    tmp_path = self.image_cache.temp_path(key)
+                    try:
+                        run_in_pool(self.process_pool, resize_for_document,
+                                    path, str(tmp_path), max_width, self.image_quality)
+                        cached_path = self.image_cache.put_file(key, tmp_path)
+                    finally:
+                        if os.path.exists(tmp_path):
+                            os.remove(tmp_path)
+                prepared.append(str(cached_path))
+            except Exception as e:
+                self.logger.warning(f"图片压缩失败，使用原图: {path}（{str(e)}）")
+                prepared.append(path)
+        return prepared
+    
+    def _template_key(self):
+        """
+        模板和样式配置的标识，模板文件修改后随之变化
+        """
+        mtime = os.path.getmtime(self.template_path) if self.template_path else None
+        return json.dumps([self.template_path, mtime, self.styles, self.prune_styles],
+                          sort_keys=True, ensure_ascii=False)
+    
+    def _template(self):
+        """
+        返回已设置好样式的模板内容，同一模板和样式配置在进程内只构建一次
+        """
+        key = self._template_key()
+        with self._templates_lock:
+            if key not in self._templates:
+                self._templates[key] = self._build_template()
+            return self._templates[key]
+    
+    def _build_template(self):
+        """
+        打开模板并设置样式，精简后保存为docx文件内容
+        """
+        if self.template_path:
+            doc = self._open_template(self.template_path)
+            # 模板中的正文不带入文章，只保留页面设置
+            body = doc.element.body
+            for child in list(body):
+                if child.tag != qn('w:sectPr'):
+                    body.remove(child)
+            # 使用模板自带的样式，模板中缺少的样式才使用默认设置
+            defaults = {name: settings for name, settings in self.DEFAULT_STYLES.items() if name not in doc.styles}
+            self._add_missing_styles(doc)
         else:
-            style = doc.styles['Caption']
-        style.font.name = '微软雅黑'
-        style.font.size = Pt(10)
-        style.font.italic = True
-        style.font.color.rgb = RGBColor(89, 89, 89)
+            doc = Document()
+            defaults = self.DEFAULT_STYLES
+        styles = {name: {**defaults.get(name, {}), **self.styles.get(name, {})}
+                  for name in {*defaults, *self.styles}}
+        
+        self._set_document_style(doc, styles)
+        if self.prune_styles:
+            self._prune_styles(doc)
+        
+        buffer = BytesIO()
+        doc.save(buffer)
+        self.logger.info(f"文档模板已构建：{self.template_path or '默认模板'}（{len(buffer.getvalue()) / 1024:.0f}KB）")
+        return buffer.getvalue()
+    
+    def _open_template(self, path):
+        """
+        打开.docx或.dotx模板，.dotx的主文档类型改为普通文档后python-docx才能打开
+        """
+        with open(path, 'rb') as f:
+            data = f.read()
+        source = zipfile.ZipFile(BytesIO(data))
+        content_types = source.read('[Content_Types].xml')
+        template_type = self.TEMPLATE_CONTENT_TYPE.encode('utf-8')
+        if template_type not in content_types:
+            return Document(BytesIO(data))
+        
+        patched = BytesIO()
+        with zipfile.ZipFile(patched, 'w', zipfile.ZIP_DEFLATED) as target:
+            for item in source.infolist():
+                content = source.read(item.filename)
+                if item.filename == '[Content_Types].xml':
+                    content = content.replace(template_type, self.DOCUMENT_CONTENT_TYPE.encode('utf-8'))
+                target.writestr(item, content)
+        return Document(BytesIO(patched.getvalue()))
+    
+    def _add_missing_styles(self, doc):
+        """
+        模板中缺少文档用到的样式（如标题、各级标题）时，从python-docx默认模板复制样式定义，
+        保留大纲级别等段落属性；所依赖的样式（basedOn/link/next）在模板中有同名样式时指向模板中的样式，
+        没有时一并复制，样式ID与模板中已有的ID冲突时改用新的ID
+        """
+        missing = [name for name in self.USED_STYLES if name not in doc.styles]
+        if not missing:
+            return
+        source = Document().styles
+        by_id = {style.get(qn('w:styleId')): style for style in source.element.findall(qn('w:style'))}
+        existing = {style.get(qn('w:styleId')) for style in doc.styles.element.findall(qn('w:style'))}
+        mapping = {}
+        
+        def resolve(style_id):
+            """
+            默认模板中的样式ID -> 模板中对应样式的ID，默认模板中没有该样式时返回None
+            """
+            if style_id in mapping:
+                return mapping[style_id]
+            style = by_id.get(style_id)
+            if style is None:
+                return None
+            name = style.find(qn('w:name')).get(qn('w:val'))
+            if name in doc.styles:
+                mapping[style_id] = doc.styles[name].style_id
+                return mapping[style_id]
+            new_id, suffix = style_id, 1
+            while new_id in existing:
+                new_id, suffix = f'{style_id}{suffix}', suffix + 1
+            mapping[style_id] = new_id
+            existing.add(new_id)
+            style = copy.deepcopy(style)
+            style.set(qn('w:styleId'), new_id)
+            doc.styles.element.append(style)
+            for tag in ('w:basedOn', 'w:link', 'w:next'):
+                reference = style.find(qn(tag))
+                if reference is not None:
+                    target = resolve(reference.get(qn('w:val')))
+                    if target is None:
+                        style.remove(reference)
+                    else:
+                        reference.set(qn('w:val'), target)
+            return new_id
+        
+        for name in missing:
+            resolve(source[name].style_id)
+        self.logger.info(f"模板中缺少样式，已使用默认定义：{', '.join(missing)}")
+    
+    def _set_document_style(self, doc, styles):
+        """
+        设置文档样式
+        :param styles: 样式名 -> {'font', 'size'（磅）, 'bold', 'italic', 'color'（十六进制RGB）}
+        """
+        for name, settings in styles.items():
+            if name in doc.styles:
+                style = doc.styles[name]
+            else:
+                style = doc.styles.add_style(name, WD_STYLE_TYPE.PARAGRAPH)
+            font = style.font
+            if 'font' in settings:
+                font.name = settings['font']
+            if 'size' in settings:
+                font.size = Pt(settings['size'])
+            if 'bold' in settings:
+                font.bold = settings['bold']
+            if 'italic' in settings:
+                font.italic = settings['italic']
+            if 'color' in settings:
+                font.color.rgb = RGBColor.from_string(settings['color'].lstrip('#').upper())
+    
+    def _prune_styles(self, doc):
+        """
+        删除文档中用不到的样式定义（及其所依赖样式以外的所有样式）和隐藏样式列表，
+        默认模板的样式表约350KB，是打开文档的主要耗时
+        """
+        element = doc.styles.element
+        by_id = {style.get(qn('w:styleId')): style for style in element.findall(qn('w:style'))}
+        pending = [doc.styles[name].style_id for name in self.USED_STYLES if name in doc.styles]
+        pending += [style_id for style_id, style in by_id.items() if style.get(qn('w:default')) == '1']
+        pending += [doc.styles[name].style_id for name in self.styles if name in doc.styles]
+        keep = set()
+        while pending:
+            style_id = pending.pop()
+            if style_id in keep or style_id not in by_id:
+                continue
+            keep.add(style_id)
+            for tag in ('w:basedOn', 'w:link', 'w:next'):
+                reference = by_id[style_id].find(qn(tag))
+                if reference is not None:
+                    pending.append(reference.get(qn('w:val')))
+        
+        for style_id, style in by_id.items():
+            if style_id not in keep:
+                element.remove(style)
+        latent_styles = element.find(qn('w:latentStyles'))
+        if latent_styles is not None:
+            element.remove(latent_styles)
+        # Word 2010 的样式副本，与 styles.xml 内容重复
+        for rel_id, rel in list(doc.part.rels.items()):
+            if rel.reltype == self.STYLES_WITH_EFFECTS:
+                doc.part.drop_rel(rel_id)
     
     def _add_content_with_images(self, doc, content, image_paths):
         """
@@ -82,30 +350,34 @@ class DocumentWriter:
         # 按段落分割内容
         paragraphs = content.split('\n\n')
         image_index = 0
+        body = _BodyBuilder(doc)
         
         # 添加标题
         if paragraphs and paragraphs[0].strip().startswith('#'):
             title_text = ' '.join(paragraphs[0].split()[1:])
-            heading = doc.add_heading(title_text, 0)
+            heading = body.add_heading(title_text, 0)
             heading.alignment = WD_ALIGN_PARAGRAPH.CENTER
             paragraphs = paragraphs[1:]
         
         # 处理正文内容
         for i, para in enumerate(paragraphs):
-            if not para.strip():
+            text = para.strip()
+            if not text:
                 continue
                 
-            if para.strip().startswith('#'):  # 标题
-                level = len(para.split()[0]) - 1
-                text = ' '.join(para.split()[1:])
-                doc.add_heading(text, level=min(level, 3))
+            if text.startswith('#'):  # 标题
+                words = text.split()
+                level = len(words[0]) - 1
+                body.add_heading(' '.join(words[1:]), level=min(level, 3))
+            elif _BodyBuilder.LINK_PATTERN.search(text):  # 含Markdown链接的段落（如相关阅读）
+                body.add_linked_paragraph(text)
             else:  # 普通段落
-                doc.add_paragraph(para.strip())
+                body.add_paragraph(text)
             
             # 每隔3个段落插入一张图片（如果还有图片的话）
             if i > 0 and i % 3 == 0 and image_index < len(image_paths):
                 self._insert_image_with_caption(
-                    doc,
+                    body,
                     image_paths[image_index],
                     f"图{image_index + 1}",
                     image_index
@@ -115,14 +387,14 @@ class DocumentWriter:
         # 插入剩余的图片
         while image_index < len(image_paths):
             self._insert_image_with_caption(
-                doc,
+                body,
                 image_paths[image_index],
                 f"图{image_index + 1}",
                 image_index
             )
             image_index += 1
     
-    def _insert_image_with_caption(self, doc, image_path, caption_text, index):
+    def _insert_image_with_caption(self, body, image_path, caption_text, index):
         """
         插入图片和说明文字
         """
@@ -132,22 +404,19 @@ class DocumentWriter:
             
         try:
             # 添加分隔段落
-            doc.add_paragraph()
+            body.add_paragraph()
             
-            # 添加图片
-            picture = doc.add_picture(image_path, width=Inches(6.0))
-            
-            # 居中对齐图片
-            last_paragraph = doc.paragraphs[-1]
-            last_paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+            # 添加图片并居中对齐
+            picture_paragraph = body.add_picture(image_path, width=Inches(self.IMAGE_WIDTH))
+            picture_paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
             
             # 添加图片说明
-            caption = doc.add_paragraph(style='Caption')
+            caption = body.add_paragraph(style='Caption')
             caption.alignment = WD_ALIGN_PARAGRAPH.CENTER
             caption.add_run(caption_text).italic = True
             
             # 添加空行
-            doc.add_paragraph()
+            body.add_paragraph()
             
         except Exception as e:
             self.logger.error(f"插入图片失败: {str(e)}")
@@ -156,17 +425,137 @@ class DocumentWriter:
         """
         移除SEO META标签
         """
-        lines = content.split('\n')
-        start_idx = -1
-        end_idx = -1
-        
-        for i, line in enumerate(lines):
-            if '<!--SEO Meta Tags-->' in line:
-                start_idx = i
-            elif '<!--End SEO Meta Tags-->' in line:
-                end_idx = i
-                break
-        
-        if start_idx != -1 and end_idx != -1:
-            return '\n'.join(lines[:start_idx] + lines[end_idx + 1:])
-        return content
\ No newline at end of file
+        return strip_meta_tags(content)
+
+
+class _BodyBuilder:
+    """
+    按顺序向文档正文末尾追加段落和图片，生成结果与 doc.add_paragraph / doc.add_heading / doc.add_picture 相同
+    python-docx每次追加段落都要在正文中查找分节属性（sectPr），每次插入图片都要扫描全文取最大的图形编号、
+    重新计算已有图片的SHA1，取最后一段还要重建整个段落列表，长文多图时耗时随长度×图片数增长；
+    这里记住分节属性的位置、缓存样式ID和图片、自行递增图形编号，并直接返回新插入的段落，
+    整体耗时与文章长度和图片数成线性关系
+    """
+    SPECIAL_CHARS = re.compile(r'([\t\r\n])')
+    LINK_PATTERN = re.compile(r'\[([^\]\n]+)\]\(([^)\s]+)\)')
+    LINK_COLOR = '0563C1'
+    
+    def __init__(self, doc):
+        self.doc = doc
+        self._parent = doc._body
+        self._body = doc.element.body
+        self._sect_pr = self._body.sectPr
+        self._style_ids = {}
+        self._next_shape_id = None
+        self._image_parts = None  # 图片SHA1 -> ImagePart
+        self._used_numbers = set()
+        self._next_number = 1
+    
+    def add_paragraph(self, text='', style=None):
+        """
+        :return: 新插入的段落（Paragraph）
+        """
+        p = OxmlElement('w:p')
+        if self._sect_pr is not None:
+            self._sect_pr.addprevious(p)
+        else:
+            self._body.append(p)
+        paragraph = Paragraph(p, self._parent)
+        if style is not None:
+            style_id = self._style_id(style)
+            if style_id is not None:
+                p.style = style_id
+        if text:
+            self.add_text(paragraph.add_run(), text)
+        return paragraph
+    
+    def add_linked_paragraph(self, text):
+        """
+        插入段落，其中的Markdown链接 [文字](地址) 转为超链接
+        :return: 新插入的段落（Paragraph）
+        """
+        paragraph = self.add_paragraph()
+        position = 0
+        for match in self.LINK_PATTERN.finditer(text):
+            if match.start() > position:
+                self.add_text(paragraph.add_run(), text[position:match.start()])
+            self.add_hyperlink(paragraph, match.group(1), match.group(2))
+            position = match.end()
+        if position < len(text):
+            self.add_text(paragraph.add_run(), text[position:])
+        return paragraph
+    
+    def add_hyperlink(self, paragraph, text, url):
+        """
+        在段落末尾追加超链接（蓝色下划线），相对地址按文档所在目录解析
+        """
+        rel_id = self.doc.part.relate_to(url, RT.HYPERLINK, is_external=True)
+        hyperlink = OxmlElement('w:hyperlink', {qn('r:id'): rel_id, qn('w:history'): '1'})
+        r = OxmlElement('w:r')
+        rpr = r.get_or_add_rPr()
+        rpr.append(OxmlElement('w:color', {qn('w:val'): self.LINK_COLOR}))
+        rpr.append(OxmlElement('w:u', {qn('w:val'): 'single'}))
+        r.add_t(text)
+        hyperlink.append(r)
+        paragraph._p.append(hyperlink)
+    
+    def add_heading(self, text, level=1):
+        return self.add_paragraph(text, 'Title' if level == 0 else f'Heading {level}')
+    
+    def add_picture(self, image_path, width):
+        """
+        插入只包含一张图片的段落
+        :return: 图片所在的段落
+        """
+        paragraph = self.add_paragraph()
+        run = paragraph.add_run()
+        part = self.doc.part
+        image_part = self._image_part(image_path)
+        rel_id = part.relate_to(image_part, RT.IMAGE)
+        image = image_part.image
+        if self._next_shape_id is None:
+            self._next_shape_id = part.next_id
+        cx, cy = image.scaled_dimensions(width, None)
+        run._r.add_drawing(CT_Inline.new_pic_inline(self._next_shape_id, rel_id, image.filename, cx, cy))
+        self._next_shape_id += 1
+        return paragraph
+    
+    def add_text(self, run, text):
+        """
+        写入文字，制表符和换行的处理与 Run.text 相同，但不逐字符处理
+        """
+        r = run._r
+        for piece in self.SPECIAL_CHARS.split(text):
+            if piece == '\t':
+                r.add_tab()
+            elif piece in ('\r', '\n'):
+                r.add_br()
+            elif piece:
+                r.add_t(piece)
+    
+    def _image_part(self, image_path):
+        """
+        内容相同的图片只嵌入一次，命名规则与python-docx相同（/word/media/imageN），
+        python-docx每插入一张图片都要重新计算已有全部图片的SHA1并扫描所有文件名
+        """
+        image_parts = self.doc.part.package.image_parts
+        if self._image_parts is None:
+            self._image_parts = {}
+            for image_part in image_parts:
+                self._image_parts.setdefault(image_part.sha1, image_part)
+            self._used_numbers = {image_part.partname.idx for image_part in image_parts}
+        image = DocxImage.from_file(image_path)
+        image_part = self._image_parts.get(image.sha1)
+        if image_part is None:
+            while self._next_number in self._used_numbers:
+                self._next_number += 1
+            image_part = ImagePart.from_image(image, PackURI(f'/word/media/image{self._next_number}.{image.ext}'))
+            self._used_numbers.add(self._next_number)
+            image_parts.append(image_part)
+            self._image_parts[image.sha1] = image_part
+        return image_part
+    
+    def _style_id(self, name):
+        if name not in self._style_ids:
+            self._style_ids[name] = self.doc.part.get_style_id(name, WD_STYLE_TYPE.PARAGRAPH)
+        return self._style_ids[name]
@@ -0,0 +1,270 @@
+import json
+import logging
+import os
+import threading
+import zlib
+from pathlib import Path
+from typing import Optional, Tuple
+import numpy as np
+from link_index import strip_related
+from utils.config import Config
+from utils.text_similarity import shingles
+
+SEED = 20240601  # 哈希参数的随机种子，修改后已保存的签名失效
+
+
+def choose_bands(num_perm, threshold):
+    """
+    选择LSH分段方式 bands×rows=num_perm：
+    候选概率曲线的拐点约为 (1/bands)^(1/rows)，取不超过阈值且最接近阈值的组合，优先保证召回
+    :return: (bands, rows)
+    """
+    options = [(bands, num_perm // bands) for bands in range(1, num_perm + 1) if num_perm % bands == 0]
+    below = [option for option in options if (1 / option[0]) ** (1 / option[1]) <= threshold]
+    if not below:
+        return options[-1]
+    return max(below, key=lambda option: (1 / option[0]) ** (1 / option[1]))
+
+
+class DuplicateIndex:
+    """
+    全部已生成文章的近似重复索引：字符分片的MinHash签名 + LSH分段
+    签名保存为uint32矩阵（10万篇、128个哈希约50MB），各分段的哈希值排序后二分查找，
+    新加入的文章先放在未排序的尾部，积累到一定数量再合并，查询耗时与文章总数基本无关
+    正在生成文档的文章先预留（reserve），同时进行的其他文章查重时也会与它比较，发布成功后才写入索引（commit）
+    索引保存在缓存目录的 duplicates 子目录
+    """
+    MERGE_SIZE = 4096  # 尾部积累到该数量时重新排序
+
+    def __init__(self, index_dir=None):
+        self.config = Config()
+        self.logger = logging.getLogger(__name__)
+        self.index_dir = Path(index_dir or Path(self.config.get('cache_dir', 'cache')) / 'duplicates')
+        self.threshold = self.config.get('duplicate_threshold', 0.8)
+        self.num_perm = self.config.get('duplicate_num_perm', 128)
+        self.shingle_size = self.config.get('duplicate_shingle_size', 5)
+        self.bands, self.rows = choose_bands(self.num_perm, self.threshold)
+
+        # 乘法移位哈希 h(x) = ((a*x + b) mod 2^64) >> 32，a为奇数，比取模运算快得多
+        rng = np.random.default_rng(SEED)
+        self._a = rng.integers(0, 2 ** 63, self.num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, self.num_perm, dtype=np.uint64) * np.uint64(2)
+        # 分段内各行的组合系数（奇数），用于把一个分段压缩为一个uint64哈希
+        self._band_coeffs = rng.integers(1, 2 ** 63, self.rows, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+
+        self._lock = threading.Lock()
+        self.names = []
+        self._signatures = np.empty((0, self.num_perm), dtype=np.uint32)
+        self._band_keys = np.empty((0, self.bands), dtype=np.uint64)
+        self._sorted_keys = np.empty((self.bands, 0), dtype=np.uint64)
+        self._sorted_ids = np.empty((self.bands, 0), dtype=np.int64)
+        self._pending = {}  # 已预留、尚未发布的文章名 -> 签名
+        self._dirty = False
+        self._load()
+
+    def __len__(self):
+        return len(self.names)
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """
+        计算文本的MinHash签名，文本为空时返回None
+        """
+        grams = shingles(text, self.shingle_size)
+        if not grams:
+            return None
+        hashes = np.fromiter((zlib.crc32(gram.encode('utf-8')) for gram in grams),
+                             dtype=np.uint64, count=len(grams))
+        signature = np.full(self.num_perm, 2 ** 32, dtype=np.uint64)
+        # 分块计算，避免 num_perm×分片数 的中间矩阵过大
+        for start in range(0, len(hashes), 2048):
+            chunk = hashes[start:start + 2048]
+            values = (self._a[:, None] * chunk[None, :] + self._b[:, None]) >> np.uint64(32)
+            np.minimum(signature, values.min(axis=1), out=signature)
+        return signature.astype(np.uint32)
+
+    def find(self, text: str) -> Optional[Tuple[str, float]]:
+        """
+        查找与文本最相似的已有文章
+        :return: (文章名, 估计的Jaccard相似度)，没有达到阈值的文章时返回None
+        """
+        signature = self.signature(text)
+        if signature is None:
+            return None
+        with self._lock:
+            return self._find(signature)
+
+    def add(self, name: str, text: str, force: bool = False) -> Optional[Tuple[str, float]]:
+        """
+        检查文章是否与已有文章近似重复，不重复或 force=True 时加入索引（查重和加入在同一把锁内完成）
+        :param name: 文章名
+        :param text: 文章内容
+        :param force: 重复时也加入索引（标记重复但仍然发布的文章）
+        :return: 重复时返回 (最相似的文章名, 相似度)，否则返回None
+        """
+        signature = self.signature(text)
+        if signature is None:
+            return None
+        with self._lock:
+            match = self._find(signature)
+            if match is None or force:
+                self._append(name, signature)
+            return match
+
+    def reserve(self, name: str, text: str, force: bool = False) -> Optional[Tuple[str, float]]:
+        """
+        查重并预留：不重复或 force=True 时记为待发布（查重和预留在同一把锁内完成），
+        之后的查重也会与它比较；文档生成成功后调用 commit 加入索引，失败时调用 release 取消
+        :return: 重复时返回 (最相似的文章名, 相似度)，否则返回None
+        """
+        signature = self.signature(text)
+        if signature is None:
+            return None
+        with self._lock:
+            match = self._find(signature)
+            if match is None or force:
+                self._pending[name] = signature
+            return match
+
+    def commit(self, name: str):
+        """
+        把预留的文章加入索引，没有预留时不做任何事
+        """
+        with self._lock:
+            signature = self._pending.pop(name, None)
+            if signature is not None:
+                self._append(name, signature)
+
+    def release(self, name: str):
+        """
+        取消预留（文章没有发布）
+        """
+        with self._lock:
+            self._pending.pop(name, None)
+
+    def add_directory(self, output_dir=None):
+        """
+        将输出目录中尚未收录的文章（docx旁的.md正文，不含文末的相关阅读小节）加入索引，
+        用于首次建立或参数变化后重建索引
+        :return: 新加入的文章数
+        """
+        output_dir = Path(output_dir or self.config.get('output_dir', 'output'))
+        known = set(self.names)
+        added = 0
+        for path in sorted(output_dir.glob('article_*.md')):
+            # .source.md 是SEO优化前的原文，只收录发布的正文
+            if path.name.endswith('.source.md'):
+                continue
+            name = path.stem[len('article_'):]
+            if name not in known:
+                self.add(name, strip_related(path.read_text(encoding='utf-8')), force=True)
+                added += 1
+        return added
+
+    def save(self):
+        """
+        保存索引（先写临时文件再替换），索引没有变化时不写入
+        保存前先合并磁盘上其他进程加入的文章，多个进程同时生成时不会互相覆盖
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            saved = self._read()
+            if saved is not None:
+                known = set(self.names)
+                for name, signature in zip(*saved):
+                    if name not in known:
+                        self._append(name, signature)
+            self.index_dir.mkdir(parents=True, exist_ok=True)
+            tmp_signatures = self.index_dir / f'signatures.{os.getpid()}.tmp.npy'
+            np.save(tmp_signatures, self._signatures[:len(self.names)])
+            tmp_index = self.index_dir / f'index.{os.getpid()}.tmp'
+            with open(tmp_index, 'w', encoding='utf-8') as f:
+                json.dump({'num_perm': self.num_perm, 'shingle_size': self.shingle_size,
+                           'seed': SEED, 'names': self.names}, f, ensure_ascii=False)
+            os.replace(tmp_signatures, self.index_dir / 'signatures.npy')
+            os.replace(tmp_index, self.index_dir / 'index.json')
+            self._dirty = False
+        self.logger.info(f"查重索引已保存：共{len(self.names)}篇文章")
+
+    def _band_keys_for(self, signatures: np.ndarray) -> np.ndarray:
+        """
+        每个分段的哈希值（uint64乘法按2^64取模）
+        """
+        rows = signatures.reshape(len(signatures), self.bands, self.rows).astype(np.uint64)
+        return (rows * self._band_coeffs).sum(axis=2, dtype=np.uint64)
+
+    def _find(self, signature):
+        keys = self._band_keys_for(signature[None, :])[0]
+        merged = self._sorted_keys.shape[1]
+        candidates = []
+        for band in range(self.bands):
+            column = self._sorted_keys[band]
+            start = np.searchsorted(column, keys[band], side='left')
+            end = np.searchsorted(column, keys[band], side='right')
+            if end > start:
+                candidates.append(self._sorted_ids[band, start:end])
+        count = len(self.names)
+        if count > merged:
+            candidates.append(np.flatnonzero((self._band_keys[merged:count] == keys).any(axis=1)) + merged)
+        candidates = np.unique(np.concatenate(candidates)) if candidates else []
+        match = None
+        if len(candidates) > 0:
+            scores = (self._signatures[candidates] == signature).mean(axis=1)
+            best = int(np.argmax(scores))
+            match = self.names[candidates[best]], float(scores[best])
+        # 已预留的文章数量不超过并发数，直接逐个比较
+        for name, pending in self._pending.items():
+            score = float((pending == signature).mean())
+            if match is None or score > match[1]:
+                match = name, score
+        if match is None or match[1] < self.threshold:
+            return None
+        return match[0], round(match[1], 4)
+
+    def _append(self, name, signature):
+        count = len(self.names)
+        if count == len(self._signatures):
+            # 按倍数扩容，避免每篇文章都复制整个矩阵
+            capacity = max(1024, count * 2)
+            self._signatures = np.resize(self._signatures, (capacity, self.num_perm))
+            self._band_keys = np.resize(self._band_keys, (capacity, self.bands))
+        self._signatures[count] = signature
+        self._band_keys[count] = self._band_keys_for(signature[None, :])[0]
+        self.names.append(name)
+        self._dirty = True
+        if count + 1 - self._sorted_keys.shape[1] >= self.MERGE_SIZE:
+            self._merge()
+
+    def _merge(self):
+        """
+        对所有文章的分段哈希重新排序
+        """
+        keys = self._band_keys[:len(self.names)].T
+        order = np.argsort(keys, axis=1, kind='stable')
+        self._sorted_keys = np.take_along_axis(keys, order, axis=1)
+        self._sorted_ids = order
+
+    def _read(self):
+        """
+        读取磁盘上的索引
+        :return: (文章名列表, 签名矩阵)，文件不存在、参数已变化或文件不一致时返回None
+        """
+        try:
+            with open(self.index_dir / 'index.json', 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            signatures = np.load(self.index_dir / 'signatures.npy')
+        except (OSError, ValueError):
+            return None
+        if (state.get('num_perm'), state.get('shingle_size'), state.get('seed')) != \
+                (self.num_perm, self.shingle_size, SEED) or len(signatures) != len(state.get('names', [])):
+            self.logger.warning("查重索引参数已变化或文件不一致，将重新建立")
+            return None
+        return state['names'], signatures.astype(np.uint32)
+
+    def _load(self):
+        saved = self._read()
+        if saved is None:
+            return
+        self.names, self._signatures = saved
+        self._band_keys = self._band_keys_for(self._signatures)
+        self._merge()
@@ -1,13 +1,17 @@
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                              QHBoxLayout, QLabel, QLineEdit, QSpinBox,
                              QPushButton, QComboBox, QMessageBox, QProgressBar,
-                             QStatusBar)
+                             QStatusBar, QTextEdit)
 from PyQt6.QtCore import Qt, QThread, pyqtSignal
+from datetime import datetime
 from article_generator import ArticleGenerator
 from image_generator import ImageGenerator
 from seo_optimizer import SEOOptimizer
 from document_writer import DocumentWriter
+from duplicate_index import DuplicateIndex
+from link_index import RelatedArticleIndex
 from utils.config import Config
 from utils.state import TaskStatus, GenerationState
 from utils.exceptions import SEOGeneratorException, APIError, ConfigError
@@ -16,14 +20,23 @@ import logging
 class GenerationThread(QThread):
     """异步生成线程"""
     progress_updated = pyqtSignal(GenerationState)
+    paragraph_ready = pyqtSignal(str)
     finished = pyqtSignal(bool, str)
     
-    def __init__(self, params):
+    def __init__(self, params, generators):
+        """
+        :param params: 生成参数
+        :param generators: 主窗口持有的长期复用的生成器，见 MainWindow._get_generators
+        """
         super().__init__()
         self.params = params
+        self.generators = generators
         self.logger = logging.getLogger(__name__)
     
     def run(self):
+        name = datetime.now().strftime("%Y%m%d_%H%M%S")
+        duplicate_index = self.generators['duplicates']
+        link_index = self.generators['links']
         try:
             # 更新状态：开始生成文章
             self.progress_updated.emit(GenerationState(
@@ -32,38 +45,65 @@ class GenerationThread(QThread):
                 message="正在生成文章..."
             ))
             
-            # 生成文章
-            article_gen = ArticleGenerator()
-            article_content = article_gen.generate(
-                self.params['requirements'],
-                self.params['word_count']
-            )
-            
-            # 更新状态：开始SEO优化
-            self.progress_updated.emit(GenerationState(
-                status=TaskStatus.RUNNING,
-                progress=0.3,
-                message="正在进行SEO优化..."
-            ))
-            
-            # SEO优化
-            seo_opt = SEOOptimizer()
-            optimized_content = seo_opt.optimize(article_content)
-            
-            # 更新状态：开始生成图片
-            self.progress_updated.emit(GenerationState(
-                status=TaskStatus.RUNNING,
-                progress=0.6,
-                message="正在生成配图..."
-            ))
-            
-            # 生成图片
-            image_gen = ImageGenerator()
-            images = image_gen.generate(
-                optimized_content,
-                self.params['image_style'],
-                self.params['watermark_text']
-            )
+            article_gen = self.generators['article']
+            image_gen = self.generators['image']
+            prompt_filter = image_gen.prompt_filter()
+            image_futures = []
+            with ThreadPoolExecutor(max_workers=image_gen.MAX_IMAGES) as pool:
+                if article_gen.should_use_sections(self.params['word_count']):
+                    # 长文：先生成大纲再并发生成各小节，完成后一次性显示
+                    article_content = article_gen.generate_sectioned(
+                        self.params['requirements'],
+                        self.params['word_count']
+                    )
+                    paragraphs = [para for para in article_content.split('\n\n') if para.strip()]
+                    for i, para in enumerate(paragraphs):
+                        self.paragraph_ready.emit(para)
+                        self._submit_image(pool, image_futures, prompt_filter, i, para)
+                else:
+                    # 流式生成文章，段落生成后立即推送到预览区，适合配图的段落一出现就开始生成图片
+                    paragraphs = []
+                    for i, para in enumerate(article_gen.generate_stream(
+                        self.params['requirements'],
+                        self.params['word_count']
+                    )):
+                        paragraphs.append(para)
+                        self.paragraph_ready.emit(para)
+                        self._submit_image(pool, image_futures, prompt_filter, i, para)
+                    article_content = '\n\n'.join(paragraphs)
+                self.logger.info(article_gen.last_metrics.summary())
+                
+                # 查重：段落已经显示，重复时只做标记，文档生成成功后才加入索引
+                duplicate_note = ''
+                if duplicate_index is not None:
+                    duplicate = duplicate_index.reserve(name, article_content, force=True)
+                    if duplicate:
+                        duplicate_note = f"，与已生成的文章 {duplicate[0]} 近似重复（相似度{duplicate[1]}）"
+                        self.logger.warning(f"文章与已有文章近似重复：{name} ≈ {duplicate[0]}（相似度{duplicate[1]}）")
+                
+                # 更新状态：开始SEO优化（配图在后台继续生成）
+                self.progress_updated.emit(GenerationState(
+                    status=TaskStatus.RUNNING,
+                    progress=0.3,
+                    message=f"正在进行SEO优化...（{article_gen.last_metrics.summary()}）{duplicate_note}"
+                ))
+                
+                # SEO优化
+                seo_opt = self.generators['seo']
+                optimized_content = seo_opt.optimize(article_content)
+                if link_index is not None:
+                    # 同步输出目录中新增或修改的文章后，在文末加入相关阅读
+                    link_index.update()
+                    optimized_content = link_index.add_links(optimized_content, name)
+                
+                # 更新状态：等待配图完成
+                self.progress_updated.emit(GenerationState(
+                    status=TaskStatus.RUNNING,
+                    progress=0.6,
+                    message="正在等待配图完成..."
+                ))
+                
+                images = [path for path in (f.result() for f in image_futures) if path]
             
             # 更新状态：开始生成文档
             self.progress_updated.emit(GenerationState(
@@ -73,19 +113,28 @@ class GenerationThread(QThread):
             ))
             
             # 生成文档
-            doc_writer = DocumentWriter()
-            doc_path = doc_writer.create_document(optimized_content, images)
+            doc_writer = self.generators['document']
+            doc_path = doc_writer.create_document(optimized_content, images, name, source=article_content)
+            if duplicate_index is not None:
+                duplicate_index.commit(name)
+                duplicate_index.save()
+            if link_index is not None:
+                # 加入索引后，之后生成的文章可以链接到它
+                link_index.add_document(name, optimized_content, doc_path)
+                link_index.save()
             
             # 完成
             self.progress_updated.emit(GenerationState(
                 status=TaskStatus.COMPLETED,
                 progress=1.0,
-                message="生成完成"
+                message="生成完成" + duplicate_note
             ))
             
             self.finished.emit(True, doc_path)
             
         except Exception as e:
+            if duplicate_index is not None:
+                duplicate_index.release(name)
             self.logger.error(f"生成失败: {str(e)}")
             self.progress_updated.emit(GenerationState(
                 status=TaskStatus.FAILED,
@@ -94,6 +143,26 @@ class GenerationThread(QThread):
             ))
             self.finished.emit(False, str(e))
 
+    def _submit_image(self, pool, image_futures, prompt_filter, index, para):
+        """
+        段落适合配图且与已提交的提示词不重复时，立即提交配图任务
+        :param pool: 配图线程池
+        :param image_futures: 已提交的配图任务列表
+        :param prompt_filter: 提示词去重过滤器，见 ImageGenerator.prompt_filter
+        :param index: 段落序号
+        :param para: 段落内容
+        """
+        image_gen = self.generators['image']
+        if len(image_futures) < image_gen.MAX_IMAGES and image_gen.is_prompt_paragraph(index, para) \
+                and prompt_filter.add(image_gen.prompt_for(para)):
+            image_futures.append(pool.submit(
+                image_gen.generate_one,
+                image_gen.prompt_for(para),
+                self.params['image_style'],
+                self.params['watermark_text'],
+                self.params['watermark_position']
+            ))
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -118,6 +187,9 @@ class MainWindow(QMainWindow):
         
         # 初始化日志
         self.logger = logging.getLogger(__name__)
+        
+        # 生成器在首次生成时创建，之后复用（共享长连接）
+        self.generators = None
     
     def _setup_ui(self):
         """设置UI界面"""
@@ -172,6 +244,12 @@ class MainWindow(QMainWindow):
         watermark_text_layout.addWidget(self.watermark_text_input)
         layout.addLayout(watermark_text_layout)
         
+        # 实时预览区
+        self.preview_output = QTextEdit()
+        self.preview_output.setReadOnly(True)
+        self.preview_output.setPlaceholderText('生成的文章将在这里实时显示')
+        layout.addWidget(self.preview_output)
+        
         # 进度条
         self.progress_bar = QProgressBar()
         self.progress_bar.setVisible(False)
@@ -181,9 +259,6 @@ class MainWindow(QMainWindow):
         self.generate_button = QPushButton('生成文章')
         self.generate_button.clicked.connect(self.generate_article)
         layout.addWidget(self.generate_button)
-        
-        # 添加弹性空间
-        layout.addStretch()
     
     def generate_article(self):
         """开始生成文章"""
@@ -205,11 +280,35 @@ class MainWindow(QMainWindow):
         }
         
         # 创建并启动生成线程
-        self.generation_thread = GenerationThread(params)
+        try:
+            generators = self._get_generators()
+        except Exception as e:
+            QMessageBox.critical(self, '错误', f'初始化失败：{str(e)}')
+            self._set_ui_enabled(True)
+            self.progress_bar.setVisible(False)
+            return
+        self.generation_thread = GenerationThread(params, generators)
+        self.preview_output.clear()
         self.generation_thread.progress_updated.connect(self._update_progress)
+        self.generation_thread.paragraph_ready.connect(self._append_paragraph)
         self.generation_thread.finished.connect(self._generation_finished)
         self.generation_thread.start()
     
+    def _get_generators(self) -> dict:
+        """获取长期复用的生成器"""
+        if self.generators is None:
+            self.generators = {
+                'article': ArticleGenerator(),
+                'seo': SEOOptimizer(),
+                'image': ImageGenerator(),
+                'document': DocumentWriter(),
+                # 近似重复检查，重复时只做标记
+                'duplicates': DuplicateIndex() if self.config.get('duplicate_check', True) else None,
+                # 相关文章内链
+                'links': RelatedArticleIndex() if self.config.get('internal_links', True) else None
+            }
+        return self.generators
+    
     def _validate_inputs(self) -> bool:
         """验证输入参数"""
         if not self.requirements_input.text().strip():
@@ -236,6 +335,10 @@ class MainWindow(QMainWindow):
         self.progress_bar.setValue(int(state.progress * 100))
         self.statusBar.showMessage(state.message)
     
+    def _append_paragraph(self, para: str):
+        """将新生成的段落追加到预览区"""
+        self.preview_output.append(para + '\n')
+    
     def _generation_finished(self, success: bool, result: str):
         """生成完成的处理"""
         self._set_ui_enabled(True)
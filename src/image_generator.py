@@ -1,15 +1,46 @@
 import requests
 import os
-import json
+import re
+import hashlib
+import shutil
+import uuid
 from datetime import datetime
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image
 from io import BytesIO
 from utils.config import Config
+from utils.rate_limiter import get_rate_limiter, backoff_delay, parse_retry_after
+from utils.clients import get_http_session, get_http_timeout
+from utils.cache import DiskCache
+from utils.text_similarity import NearDuplicateFilter
+from watermark import apply_watermark, normalize_position, watermark_file
+from seo_optimizer import strip_meta_tags
+from link_index import strip_related
+from image_processing import run_in_pool
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from pathlib import Path
 
 class ImageGenerator:
-    def __init__(self):
+    MAX_IMAGES = 3  # 每篇文章最多生成3张图
+    API_URL = "https://api.siliconflow.cn/v1/images/generations"
+    MODEL = "black-forest-labs/FLUX.1-dev"
+    IMAGE_SIZE = "1024x1024"
+    NUM_INFERENCE_STEPS = 10
+    UNSAFE_FILENAME_CHARS = re.compile(r'[\\/:*?"<>|\s.]+')  # 文件名中不能使用的字符
+    
+    # 进程内共享的图片任务线程池，批量模式下多篇文章的配图共用同一个并发上限
+    _executor = None
+    _executor_lock = threading.Lock()
+    # 按缓存键分段加锁，相同图片的并发请求只调用一次API
+    _key_locks = [threading.Lock() for _ in range(64)]
+    
+    def __init__(self, session=None, process_pool=None):
+        """
+        :param session: 可选，外部传入的 requests.Session；默认按主机从进程内注册表获取长连接会话
+        :param process_pool: 可选，图片后处理进程池（批量模式），默认在当前线程处理
+        """
         self.config = Config()
         self.logger = logging.getLogger(__name__)
         
@@ -20,6 +51,24 @@ class ImageGenerator:
             
             self.output_dir = os.path.join('output', 'images')
             os.makedirs(self.output_dir, exist_ok=True)
+            self.rate_limiter = get_rate_limiter('flux')
+            self.max_retries = self.config.get('image_max_retries', 3)
+            self.session = session
+            self.process_pool = process_pool
+            self.timeout = get_http_timeout()
+            self.image_timeout = self.config.get('image_timeout', 300)
+            self.max_image_bytes = self.config.get('image_max_mb', 20) * 1024 * 1024
+            self.watermark_opacity = self.config.get('watermark_opacity', 0.5)
+            # 提示词相似度达到该值视为重复，不再单独生成配图
+            self.prompt_similarity = self.config.get('image_prompt_similarity', 0.6)
+            
+            # 原图缓存：相同模型、提示词、风格、尺寸和步数只调用一次API
+            self.cache_enabled = self.config.get('cache_enabled', True)
+            self.cache = DiskCache(
+                'images',
+                max_bytes=self.config.get('image_cache_max_mb', 1024) * 1024 * 1024,
+                suffix='.png'
+            )
             self.logger.info("图片生成器初始化成功")
             
         except Exception as e:
@@ -27,93 +76,278 @@ class ImageGenerator:
             self.logger.error(error_msg)
             raise Exception(error_msg)
         
-    def generate(self, article_content, image_style="", watermark_text=""):
+    def generate(self, article_content, image_style="", watermark_text="", watermark_position="bottom-right",
+                 manifest=None):
         """
         生成并处理图片
         :param article_content: 文章内容
         :param image_style: 图片风格
         :param watermark_text: 水印文字
+        :param watermark_position: 水印位置，支持GUI中的中文选项（如"右下角"、"居中"）
+        :param manifest: 可选，ArticleManifest，配图段落未变化时直接使用上次生成的图片
         :return: 生成的图片路径列表
         """
         image_prompts = self._extract_image_prompts(article_content)
-        image_paths = []
+        return self.generate_many(image_prompts, image_style, watermark_text, watermark_position, manifest)
+    
+    def generate_many(self, prompts, image_style="", watermark_text="", watermark_position="bottom-right",
+                      manifest=None):
+        """
+        并发生成多张图片，单张失败或超时不影响其他图片
+        :param prompts: 提示词列表
+        :param image_style: 图片风格
+        :param watermark_text: 水印文字
+        :param watermark_position: 水印位置
+        :param manifest: 可选，ArticleManifest，记录并复用各提示词对应的输出图片
+        :return: 成功生成的图片路径列表，顺序与提示词一致
+        """
+        executor = self._get_executor()
+        keys = [
+            DiskCache.make_key(prompt, image_style, watermark_text, normalize_position(watermark_position),
+                               self.watermark_opacity)
+            for prompt in prompts
+        ]
+        reused = [manifest.path('images', key) if manifest is not None else None for key in keys]
+        futures = [
+            None if path else executor.submit(self.generate_one, prompt, image_style,
+                                              watermark_text, watermark_position)
+            for prompt, path in zip(prompts, reused)
+        ]
         
-        for prompt in image_prompts:
+        # 各图片并行执行，超时从提交时开始统一计算
+        deadline = time.monotonic() + self.image_timeout
+        image_paths = []
+        for prompt, key, path, future in zip(prompts, keys, reused, futures):
+            if future is None:
+                image_paths.append(path)
+                continue
             try:
-                # 生成图片
-                image_data = self._generate_image(prompt)
-                if image_data:
-                    # 添加水印（如果有）
-                    if watermark_text:
-                        image = Image.open(BytesIO(image_data))
-                        image = self._add_watermark(image, watermark_text, 'bottom-right')
-                        # 保存带水印的图片
-                        image_path = self._save_image(prompt, image_data)
-                    else:
-                        # 直接保存原图
-                        image_path = self._save_image(prompt, image_data)
-                    
-                    image_paths.append(image_path)
-                    
-            except Exception as e:
-                print(f"生成图片时出错: {str(e)}")
+                image_path = future.result(timeout=max(0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                future.cancel()
+                self.logger.warning(f"图片生成超时（{self.image_timeout}秒）：{prompt[:30]}")
                 continue
-                
+            if image_path:
+                image_paths.append(image_path)
+                if manifest is not None:
+                    manifest.put('images', key, image_path)
+        
         return image_paths
     
+    @classmethod
+    def _get_executor(cls):
+        with cls._executor_lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=Config().get('image_concurrency', 4),
+                    thread_name_prefix='image'
+                )
+            return cls._executor
+    
+    def generate_one(self, prompt, image_style="", watermark_text="", watermark_position="bottom-right"):
+        """
+        根据单个提示词生成并保存图片，流式模式下可在段落生成后立即调用
+        :param prompt: 图片提示词
+        :param image_style: 图片风格
+        :param watermark_text: 水印文字
+        :param watermark_position: 水印位置
+        :return: 图片路径，失败时返回None
+        """
+        try:
+            # 输出图片从缓存中的原图派生，缓存未命中时才调用API
+            image_path = self._image_path(prompt)
+            if self.cache_enabled:
+                original_path = self._get_original(prompt, image_style)
+            else:
+                original_path = image_path
+                self._generate_image(prompt, image_path)
+            
+            # 添加水印（如果有）并写入输出文件，缓存中的原图保持不变
+            if watermark_text:
+                run_in_pool(self.process_pool, watermark_file, original_path, image_path,
+                            watermark_text, watermark_position, self.watermark_opacity)
+            elif original_path != image_path:
+                shutil.copyfile(original_path, image_path)
+            
+            return image_path
+                
+        except Exception as e:
+            self.logger.error(f"生成图片时出错: {str(e)}")
+        return None
+    
+    def _get_original(self, prompt, image_style=""):
+        """
+        返回原图在缓存中的路径，未命中时调用API生成并写入缓存
+        """
+        key = DiskCache.make_key(self.MODEL, prompt, image_style,
+                                 self.IMAGE_SIZE, self.NUM_INFERENCE_STEPS)
+        with self._key_locks[int(key[:8], 16) % len(self._key_locks)]:
+            cached_path = self.cache.get_path(key)
+            if cached_path is not None:
+                stats = self.cache.stats()
+                self.logger.info(f"命中图片缓存（命中{stats['hits']}次/未命中{stats['misses']}次）")
+                return cached_path
+            
+            tmp_path = self.cache.temp_path(key)
+            try:
+                self._generate_image(prompt, tmp_path)
+                return self.cache.put_file(key, tmp_path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+    
     def _extract_image_prompts(self, article_content):
         """
         从文章内容中提取需要生成图片的关键段落
+        与已选提示词近似重复的段落会被跳过，改用后面内容不同的段落
+        SEO优化后的文章只取正文，不含文首的META信息和文末的相关阅读小节
         """
-        paragraphs = article_content.split('\n\n')
+        paragraphs = strip_related(strip_meta_tags(article_content)).split('\n\n')
+        prompt_filter = self.prompt_filter()
         prompts = []
         for i, para in enumerate(paragraphs):
-            if i % 2 == 0 and len(para.strip()) > 100:  # 每隔一个段落，且段落长度大于100
-                prompts.append(para[:200])  # 取前200个字作为提示词
-        return prompts[:3]  # 最多生成3张图
+            if len(prompts) >= self.MAX_IMAGES:
+                break
+            if self.is_prompt_paragraph(i, para):
+                prompt = self.prompt_for(para)
+                if prompt_filter.add(prompt):
+                    prompts.append(prompt)
+                else:
+                    self.logger.info(f"跳过近似重复的配图提示词：{prompt[:30]}")
+        return prompts
+    
+    def prompt_filter(self):
+        """
+        创建提示词去重过滤器，每篇文章使用一个
+        """
+        return NearDuplicateFilter(self.prompt_similarity)
     
-    def _generate_image(self, prompt):
+    def is_prompt_paragraph(self, index, para):
         """
-        调用FLUX API生成图片
+        判断段落是否用于生成配图：每隔一个段落，且段落长度大于100
         """
-        url = "https://api.siliconflow.cn/v1/images/generations"
+        return index % 2 == 0 and len(para.strip()) > 100
+    
+    def prompt_for(self, para):
+        """
+        取段落前200个字作为提示词
+        """
+        return para[:200]
+    
+    def _generate_image(self, prompt, image_path):
+        """
+        调用FLUX API生成图片并下载到指定路径
+        :return: 图片内容的SHA-256
+        """
+        url = self.API_URL
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
         payload = {
-            "model": "black-forest-labs/FLUX.1-dev",
+            "model": self.MODEL,
             "prompt": prompt,
-            "image_size": "1024x1024",
-            "num_inference_steps": 10
+            "image_size": self.IMAGE_SIZE,
+            "num_inference_steps": self.NUM_INFERENCE_STEPS
         }
         
         try:
-            response = requests.post(url, json=payload, headers=headers)
-            response.raise_for_status()
+            response = self._post_with_retry(url, payload, headers)
             
             result = response.json()
             if 'data' in result and len(result['data']) > 0:
                 image_url = result['data'][0].get('url')
                 if image_url:
-                    image_response = requests.get(image_url)
-                    image_response.raise_for_status()
-                    return image_response.content
+                    return self._download_image(image_url, image_path)
                     
             raise Exception("未能获取到图片URL")
             
         except Exception as e:
             raise Exception(f"生成图片失败: {str(e)}")
     
-    def _save_image(self, prompt: str, image_data: bytes) -> str:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"{timestamp}_{prompt[:30]}.png"
-        file_path = Path(self.output_dir) / filename
+    def _download_image(self, image_url, image_path, chunk_size=64 * 1024):
+        """
+        分块流式下载图片到临时文件，完成后原子重命名，内存占用与图片大小无关
+        超过 image_max_mb 时中止下载
+        :return: 图片内容的SHA-256
+        """
+        tmp_path = f"{image_path}.{uuid.uuid4().hex}.part"
+        digest = hashlib.sha256()
+        size = 0
         
-        with open(file_path, 'wb') as f:
-            f.write(image_data)
+        try:
+            with self._session_for(image_url).get(image_url, timeout=self.timeout, stream=True) as response:
+                response.raise_for_status()
+                # 压缩传输时Content-Length为压缩后大小，不用于完整性校验
+                content_length = 0 if response.headers.get('Content-Encoding') else \
+                    int(response.headers.get('Content-Length') or 0)
+                if content_length > self.max_image_bytes:
+                    raise Exception(f"图片大小{content_length}字节超过上限{self.max_image_bytes}字节")
+                
+                with open(tmp_path, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        size += len(chunk)
+                        if size > self.max_image_bytes:
+                            raise Exception(f"图片大小超过上限{self.max_image_bytes}字节")
+                        digest.update(chunk)
+                        f.write(chunk)
+            
+            if content_length and size != content_length:
+                raise Exception(f"图片下载不完整：{size}/{content_length}字节")
+            os.replace(tmp_path, image_path)
+            
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
         
-        return str(file_path)
+        checksum = digest.hexdigest()
+        self.logger.info(f"图片已下载：{image_path}（{size}字节，sha256={checksum[:12]}）")
+        return checksum
+    
+    def _session_for(self, url):
+        return self.session or get_http_session(url)
+    
+    def _post_with_retry(self, url, payload, headers, retry_delay=2):
+        """
+        经过共享限流器发送请求，429/5xx及网络错误按指数退避重试，并遵守Retry-After
+        """
+        # image_max_retries 为0时也至少发送一次
+        attempts = max(1, self.max_retries)
+        for attempt in range(attempts):
+            final = attempt == attempts - 1
+            self.rate_limiter.acquire()
+            try:
+                response = self._session_for(url).post(url, json=payload, headers=headers,
+                                                       timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.logger.warning(f"图片API请求错误（第{attempt + 1}次尝试）：{str(e)}")
+                if final:
+                    raise
+                time.sleep(backoff_delay(attempt, retry_delay))
+                continue
+            
+            if response.status_code == 429 or response.status_code >= 500:
+                retry_after = parse_retry_after(response.headers)
+                self.logger.warning(f"图片API被限流或服务繁忙（第{attempt + 1}次尝试，状态码{response.status_code}）")
+                if retry_after is not None:
+                    self.rate_limiter.pause(retry_after)
+                if not final:
+                    time.sleep(backoff_delay(attempt, retry_delay, retry_after=retry_after))
+                    continue
+            
+            response.raise_for_status()
+            return response
+    
+    def _image_path(self, prompt: str) -> str:
+        """
+        输出图片路径：时间戳 + 提示词前20个字（去掉文件名中不能使用的字符）+ 随机后缀，
+        批量模式下多篇文章同时生成提示词相同的配图时也不会互相覆盖
+        """
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        label = self.UNSAFE_FILENAME_CHARS.sub('_', prompt[:20]).strip('_') or 'image'
+        filename = f"{timestamp}_{label}_{uuid.uuid4().hex[:8]}.png"
+        return str(Path(self.output_dir) / filename)
     
     def _add_watermark(self, image, text, position='bottom-right'):
         """
@@ -121,44 +355,4 @@ class ImageGenerator:
         """
         if not isinstance(image, Image.Image):
             image = Image.open(BytesIO(image))
-            
-        # 确保图片是RGBA模式
-        image = image.convert('RGBA')
-        width, height = image.size
-        
-        # 创建水印层
-        watermark = Image.new('RGBA', image.size, (0,0,0,0))
-        draw = ImageDraw.Draw(watermark)
-        
-        # 设置字体和大小
-        font_size = int(min(width, height) * 0.05)
-        try:
-            font = ImageFont.truetype('arial.ttf', font_size)
-        except:
-            font = ImageFont.load_default()
-        
-        # 获取文本大小
-        text_bbox = draw.textbbox((0, 0), text, font=font)
-        text_width = text_bbox[2] - text_bbox[0]
-        text_height = text_bbox[3] - text_bbox[1]
-        
-        # 计算水印位置
-        padding = 20
-        if position == 'bottom-right':
-            x = width - text_width - padding
-            y = height - text_height - padding
-        elif position == 'bottom-left':
-            x = padding
-            y = height - text_height - padding
-        elif position == 'top-right':
-            x = width - text_width - padding
-            y = padding
-        else:  # top-left
-            x = padding
-            y = padding
-        
-        # 绘制水印文本
-        draw.text((x, y), text, font=font, fill=(255,255,255,128))
-        
-        # 合并原图和水印
-        return Image.alpha_composite(image, watermark)
\ No newline at end of file
+        return apply_watermark(image, text, position, self.watermark_opacity)
@@ -0,0 +1,68 @@
+import hashlib
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+from utils.config import Config
+
+# 本模块中的函数都是模块级函数，参数和返回值只有文件路径和基本类型，可直接提交到进程池
+
+def create_process_pool(max_workers=None):
+    """
+    创建图片后处理进程池，用于水印、缩放和重新编码等CPU密集的处理
+    :param max_workers: 进程数，默认读取配置项 image_process_workers（默认为CPU核数）
+    :return: 进程池，配置为0时返回None（在调用线程中处理）
+    """
+    if max_workers is None:
+        max_workers = Config().get('image_process_workers', os.cpu_count() or 1)
+    if not max_workers:
+        return None
+    logging.getLogger(__name__).info(f"图片处理进程池：{max_workers}个进程")
+    return ProcessPoolExecutor(max_workers=max_workers)
+
+def run_in_pool(pool, func, *args):
+    """
+    在进程池中执行并等待结果，pool为None时直接在当前线程执行
+    """
+    if pool is None:
+        return func(*args)
+    return pool.submit(func, *args).result()
+
+def file_digest(path, chunk_size=64 * 1024):
+    """
+    计算文件内容的SHA-256
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def resize_for_document(src_path, dst_path, max_width, quality=85):
+    """
+    按文档中的实际显示宽度缩小图片并重新编码为JPEG，透明背景填充为白色
+    :param src_path: 原图路径（不会被修改）
+    :param dst_path: 输出路径
+    :param max_width: 最大宽度（像素），原图更窄时不放大
+    :param quality: JPEG质量（1~95）
+    :return: 输出路径
+    """
+    with Image.open(src_path) as image:
+        if image.width > max_width:
+            size = (max_width, max(1, round(image.height * max_width / image.width)))
+            # JPEG原图可在解码时直接按比例缩小
+            image.draft('RGB', size)
+            image = image.resize(size, Image.Resampling.LANCZOS)
+        else:
+            image.load()
+
+        if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        image.save(dst_path, format='JPEG', quality=quality, optimize=True, progressive=True)
+    return dst_path
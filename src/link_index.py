@@ -0,0 +1,294 @@
+import json
+import logging
+import math
+import os
+import re
+import threading
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import List, Optional, Tuple
+import numpy as np
+from utils.config import Config
+from utils.segmenter import STOP_WORDS, get_segmenter
+
+RELATED_HEADING = '## 相关阅读'
+TITLE_PATTERN = re.compile(r'^#\s+(.+)$', re.MULTILINE)
+SEED = 20240615  # 随机投影矩阵的种子，修改后已保存的向量失效
+
+
+def strip_related(content):
+    """
+    去掉文末的相关阅读小节（重新发布或建立索引时不计入正文）
+    """
+    index = content.rfind(RELATED_HEADING)
+    if index != -1:
+        content = content[:index].rstrip('\n')
+    return content
+
+
+class RelatedArticleIndex:
+    """
+    相关文章索引：用于在新文章中插入站内链接
+    文章向量为词频（1+log tf）经特征哈希和随机投影得到的低维稠密向量（默认128维），按余弦相似度检索；
+    文章数较多时用k-means聚类建立倒排表（IVF），查询只扫描最接近的几个聚类，
+    文章数增长到训练时的4倍时重新聚类
+    索引保存在缓存目录的 links 子目录，按输出目录中 .md 正文的修改时间增量更新
+    """
+    BUCKETS = 1 << 14  # 特征哈希的桶数
+    MIN_TRAIN = 4096  # 文章数达到该值后才建立聚类，之前精确检索
+
+    def __init__(self, index_dir=None):
+        self.config = Config()
+        self.logger = logging.getLogger(__name__)
+        self.index_dir = Path(index_dir or Path(self.config.get('cache_dir', 'cache')) / 'links')
+        self.dim = self.config.get('internal_link_dim', 128)
+        self.nprobe = self.config.get('internal_link_nprobe', 8)
+        self.count = self.config.get('internal_link_count', 3)
+        self.min_similarity = self.config.get('internal_link_min_similarity', 0.2)
+        self.url_template = self.config.get('internal_link_url', 'article_{name}.docx')
+        self.segmenter = get_segmenter()
+        self._projection = np.random.default_rng(SEED).standard_normal(
+            (self.BUCKETS, self.dim), dtype=np.float32) / math.sqrt(self.dim)
+
+        self._lock = threading.Lock()
+        self.docs = []  # 行序号 -> {'name', 'title', 'path', 'mtime'}，已删除的文章为None
+        self._positions = {}  # 文章名 -> 行序号
+        self._vectors = np.empty((0, self.dim), dtype=np.float32)
+        self._centroids = None
+        self._lists = []  # 聚类序号 -> 行序号列表
+        self._assignments = []  # 行序号 -> 聚类序号
+        self._trained_size = 0
+        self._dirty = False
+        self._load()
+
+    def __len__(self):
+        return len(self._positions)
+
+    def embed(self, content: str) -> Optional[np.ndarray]:
+        """
+        计算文章向量（已归一化），没有可用的词时返回None
+        """
+        words = self.segmenter.cut(strip_related(content).lower())
+        counts = Counter(word for word in words if len(word) > 1 and word not in STOP_WORDS)
+        if not counts:
+            return None
+        buckets = np.fromiter((zlib.crc32(word.encode('utf-8')) % self.BUCKETS for word in counts),
+                              dtype=np.int64, count=len(counts))
+        weights = 1 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+        vector = weights @ self._projection[buckets]
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def add(self, name: str, content: str, path: str = '', mtime: float = 0.0):
+        """
+        加入或更新一篇文章
+        :param path: 文章的 .md 正文路径，用于增量更新时判断文件是否变化
+        """
+        vector = self.embed(content)
+        if vector is None:
+            return
+        match = TITLE_PATTERN.search(content)
+        doc = {'name': name, 'title': match.group(1).strip() if match else name, 'path': path, 'mtime': mtime}
+        with self._lock:
+            self._remove(name)
+            self._append(doc, vector)
+
+    def add_document(self, name: str, content: str, doc_path: str):
+        """
+        加入刚生成的文档，记录docx旁的 .md 正文及其修改时间，之后增量更新时不再重复分析
+        """
+        md_path = os.path.splitext(doc_path)[0] + '.md'
+        if os.path.exists(md_path):
+            self.add(name, content, md_path, os.path.getmtime(md_path))
+        else:
+            self.add(name, content)
+
+    def update(self, output_dir=None):
+        """
+        扫描输出目录中的文章（docx旁的.md正文），加入新增或修改过的文章，移除已删除的文章
+        :return: 新增或更新的文章数
+        """
+        output_dir = Path(output_dir or self.config.get('output_dir', 'output'))
+        # .source.md 是SEO优化前的原文，只索引发布的正文
+        current = {str(path): path for path in output_dir.glob('article_*.md')
+                   if not path.name.endswith('.source.md')}
+        with self._lock:
+            for doc in list(self.docs):
+                if doc and doc['path'] and doc['path'] not in current:
+                    self._remove(doc['name'])
+            known = {doc['path']: doc['mtime'] for doc in self.docs if doc}
+
+        updated = 0
+        for key, path in sorted(current.items()):
+            mtime = path.stat().st_mtime
+            if known.get(key) != mtime:
+                self.add(path.stem[len('article_'):], path.read_text(encoding='utf-8'), key, mtime)
+                updated += 1
+        if updated:
+            self.logger.info(f"相关文章索引已更新：新增/更新{updated}篇，共{len(self)}篇")
+        return updated
+
+    def related(self, content: str, k: Optional[int] = None, exclude: Optional[str] = None) -> List[Tuple[dict, float]]:
+        """
+        查找最相关的k篇文章
+        :param exclude: 排除的文章名（通常是文章自身）
+        :return: [(文章信息, 相似度)]，按相似度从高到低，不含低于 internal_link_min_similarity 的文章
+        """
+        k = k or self.count
+        vector = self.embed(content)
+        if vector is None:
+            return []
+        with self._lock:
+            if self._centroids is not None:
+                probes = np.argsort(-(self._centroids @ vector))[:self.nprobe]
+                rows = [row for probe in probes for row in self._lists[probe]]
+            else:
+                rows = range(len(self.docs))
+            rows = np.array([row for row in rows if self.docs[row] and self.docs[row]['name'] != exclude],
+                            dtype=np.int64)
+            if not len(rows):
+                return []
+            scores = self._vectors[rows] @ vector
+            top = np.argpartition(-scores, k - 1)[:k] if len(scores) > k else np.arange(len(scores))
+            top = top[np.argsort(-scores[top])]
+            return [(self.docs[rows[i]], round(float(scores[i]), 4))
+                    for i in top if scores[i] >= self.min_similarity]
+
+    def add_links(self, content: str, name: Optional[str] = None) -> str:
+        """
+        在文末插入相关阅读小节，每行一个Markdown链接，生成Word文档时转为超链接
+        :param content: SEO优化后的文章内容
+        :param name: 文章名，查询时排除文章自身
+        """
+        content = strip_related(content)
+        related = self.related(content, exclude=name)
+        if not related:
+            return content
+
+        section = '\n'.join(f"- [{doc['title']}]({self.url_template.format(name=doc['name'])})"
+                             for doc, _ in related)
+        return f"{content}\n\n{RELATED_HEADING}\n\n{section}"
+
+    def save(self):
+        """
+        保存索引（先写临时文件再替换），已删除的文章在保存时清理
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            self._compact()
+            self.index_dir.mkdir(parents=True, exist_ok=True)
+            files = {'vectors.npy': self._vectors[:len(self.docs)],
+                     'assignments.npy': np.array(self._assignments, dtype=np.int32)}
+            if self._centroids is not None:
+                files['centroids.npy'] = self._centroids
+            for filename, array in files.items():
+                tmp_path = self.index_dir / f'{filename}.{os.getpid()}.tmp.npy'
+                np.save(tmp_path, array)
+                os.replace(tmp_path, self.index_dir / filename)
+            tmp_index = self.index_dir / f'index.{os.getpid()}.tmp'
+            with open(tmp_index, 'w', encoding='utf-8') as f:
+                json.dump({'dim': self.dim, 'seed': SEED, 'trained_size': self._trained_size,
+                           'docs': self.docs}, f, ensure_ascii=False)
+            os.replace(tmp_index, self.index_dir / 'index.json')
+            self._dirty = False
+        self.logger.info(f"相关文章索引已保存：共{len(self)}篇文章")
+
+    def _append(self, doc, vector):
+        count = len(self.docs)
+        if count == len(self._vectors):
+            # 按倍数扩容，避免每篇文章都复制整个矩阵
+            capacity = max(1024, count * 2)
+            self._vectors = np.resize(self._vectors, (capacity, self.dim))
+        self._vectors[count] = vector
+        self.docs.append(doc)
+        self._positions[doc['name']] = count
+        self._dirty = True
+
+        if self._centroids is not None:
+            cluster = int(np.argmax(self._centroids @ vector))
+            self._assignments.append(cluster)
+            self._lists[cluster].append(count)
+        if len(self) >= self.MIN_TRAIN and len(self) >= self._trained_size * 4:
+            self._train()
+
+    def _remove(self, name):
+        row = self._positions.pop(name, None)
+        if row is not None:
+            self.docs[row] = None
+            self._dirty = True
+
+    def _train(self, iterations=8, sample_size=20000):
+        """
+        用k-means（聚类数约为文章数的平方根）建立倒排表
+        """
+        alive = np.array([row for row, doc in enumerate(self.docs) if doc], dtype=np.int64)
+        nlist = min(1024, int(math.sqrt(len(alive))))
+        rng = np.random.default_rng(SEED)
+        sample = self._vectors[rng.choice(alive, min(sample_size, len(alive)), replace=False)]
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            for cluster in range(nlist):
+                members = sample[labels == cluster]
+                if len(members):
+                    mean = members.sum(axis=0)
+                    centroids[cluster] = mean / (np.linalg.norm(mean) or 1)
+
+        self._centroids = centroids
+        self._assign()
+        self._trained_size = len(alive)
+        self.logger.info(f"相关文章索引已重新聚类：{len(alive)}篇文章，{nlist}个聚类")
+
+    def _assign(self, chunk_size=8192):
+        """
+        把所有文章分配到最近的聚类
+        """
+        count = len(self.docs)
+        self._assignments = []
+        for start in range(0, count, chunk_size):
+            block = self._vectors[start:min(start + chunk_size, count)]
+            self._assignments.extend(np.argmax(block @ self._centroids.T, axis=1).tolist())
+        self._build_lists()
+
+    def _build_lists(self):
+        self._lists = [[] for _ in range(len(self._centroids))]
+        for row, cluster in enumerate(self._assignments):
+            if self.docs[row]:
+                self._lists[cluster].append(row)
+
+    def _compact(self):
+        """
+        去掉已删除的文章，重新编号
+        """
+        alive = [row for row, doc in enumerate(self.docs) if doc]
+        if len(alive) == len(self.docs):
+            return
+        self._vectors = self._vectors[alive]
+        self.docs = [self.docs[row] for row in alive]
+        self._positions = {doc['name']: row for row, doc in enumerate(self.docs)}
+        if self._centroids is not None:
+            self._assignments = [self._assignments[row] for row in alive]
+            self._build_lists()
+
+    def _load(self):
+        try:
+            with open(self.index_dir / 'index.json', 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            vectors = np.load(self.index_dir / 'vectors.npy')
+            assignments = np.load(self.index_dir / 'assignments.npy')
+            centroids = np.load(self.index_dir / 'centroids.npy') if state['trained_size'] else None
+        except (OSError, ValueError, KeyError):
+            return
+        if (state.get('dim'), state.get('seed')) != (self.dim, SEED) or len(vectors) != len(state['docs']):
+            self.logger.warning("相关文章索引参数已变化或文件不一致，将重新建立")
+            return
+        self.docs = state['docs']
+        self._positions = {doc['name']: row for row, doc in enumerate(self.docs)}
+        self._vectors = vectors.astype(np.float32)
+        self._trained_size = state['trained_size']
+        if centroids is not None and len(assignments) == len(self.docs):
+            self._centroids = centroids
+            self._assignments = assignments.tolist()
+            self._build_lists()
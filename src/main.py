@@ -1,10 +1,14 @@
 import argparse
 import logging
 import os
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from article_generator import ArticleGenerator
 from image_generator import ImageGenerator
 from document_writer import DocumentWriter
 from utils.config import Config
+from utils import clients
 
 def setup_logging():
     """设置日志配置"""
@@ -31,41 +35,112 @@ def display_article(content):
     
     paragraphs = content.split('\n\n')
     for para in paragraphs:
-        if para.strip():
-            # 处理标题
-            if para.strip().startswith('#'):
-                level = len(para.split()[0])  # 计算#的数量
-                text = ' '.join(para.split()[1:])
-                print("\n" + "  " * (level-1) + text)
-            else:
-                print("\n" + para.strip())
+        display_paragraph(para)
     
     print("\n" + "="*50 + "\n")
 
+def display_paragraph(para):
+    """
+    在控制台显示单个段落
+    """
+    if para.strip():
+        # 处理标题
+        if para.strip().startswith('#'):
+            level = len(para.split()[0])  # 计算#的数量
+            text = ' '.join(para.split()[1:])
+            print("\n" + "  " * (level-1) + text)
+        else:
+            print("\n" + para.strip())
+
+def generate_streaming(article_gen, image_gen, requirements, word_count, watermark, use_cache=True):
+    """
+    流式生成：边生成边显示段落，适合配图的段落一出现就提交配图任务
+    :return: (文章内容, 图片路径列表)
+    """
+    logger = logging.getLogger(__name__)
+    paragraphs = []
+    image_futures = []
+    prompt_filter = image_gen.prompt_filter()
+    
+    print("\n" + "="*50)
+    print("生成的文章内容：")
+    print("="*50)
+    
+    with ThreadPoolExecutor(max_workers=image_gen.MAX_IMAGES) as pool:
+        for i, para in enumerate(article_gen.generate_stream(requirements, word_count, use_cache=use_cache)):
+            display_paragraph(para)
+            paragraphs.append(para)
+            if len(image_futures) < image_gen.MAX_IMAGES and image_gen.is_prompt_paragraph(i, para) \
+                    and prompt_filter.add(image_gen.prompt_for(para)):
+                image_futures.append(pool.submit(
+                    image_gen.generate_one,
+                    image_gen.prompt_for(para),
+                    "",
+                    watermark
+                ))
+        
+        print("\n" + "="*50 + "\n")
+        logger.info(article_gen.last_metrics.summary())
+        print(f"耗时统计：{article_gen.last_metrics.summary()}")
+        
+        print("正在等待配图完成...")
+        image_paths = [path for path in (f.result() for f in image_futures) if path]
+    
+    return '\n\n'.join(paragraphs), image_paths
+
 def main():
     """统一的程序入口"""
     parser = argparse.ArgumentParser()
     parser.add_argument('--gui', action='store_true', help='启动GUI界面')
-    args = parser.parse_args()
+    args, _ = parser.parse_known_args()
     
-    if args.gui:
-        from gui import start_gui
-        start_gui()
-    else:
-        start_cli()
+    try:
+        if args.gui:
+            from gui import start_gui
+            start_gui()
+        else:
+            start_cli()
+    finally:
+        clients.close_all()
 
 def start_cli():
     parser = argparse.ArgumentParser(description='SEO文章智能生成系统')
     parser.add_argument('--requirements', '-r', type=str, help='文章要求，例如："写一篇关于人工智能的文章"')
     parser.add_argument('--word_count', '-w', type=int, help='文章字数，例如：1000')
     parser.add_argument('--watermark', '-m', type=str, help='水印文字，例如："版权所有"')
+    parser.add_argument('--batch', '-b', type=str, help='批量模式的关键词文件（CSV或每行一个关键词的文本）')
+    parser.add_argument('--concurrency', '-c', type=int, help='批量模式下同时进行的生成请求数，例如：16')
+    parser.add_argument('--no-images', action='store_true', help='批量模式和重新发布时不生成配图')
+    parser.add_argument('--stream', '-s', action='store_true', help='流式生成，边生成边显示并提前生成配图')
+    parser.add_argument('--no-cache', action='store_true', help='跳过文章缓存，强制重新生成')
+    parser.add_argument('--sections', action='store_true', help='先生成大纲再并发生成各小节（长文默认启用）')
+    parser.add_argument('--corpus-report', action='store_true', help='分析输出目录中已生成的全部文章，输出关键词统计和蚕食报告')
+    parser.add_argument('--republish', nargs='+', metavar='FILE',
+                        help='重新发布修改过的文章（SEO优化前的原文，例如output/article_xxx.source.md），只重新处理变化的段落')
+    parser.add_argument('--index-duplicates', action='store_true', help='将输出目录中已有的文章加入近似重复检查索引')
     
-    args = parser.parse_args()
+    args, _ = parser.parse_known_args()
     
     # 设置日志
     setup_logging()
     logger = logging.getLogger(__name__)
     
+    if args.corpus_report:
+        start_corpus_report()
+        return
+    
+    if args.batch:
+        start_batch(args)
+        return
+    
+    if args.republish:
+        start_republish(args)
+        return
+    
+    if args.index_duplicates:
+        start_index_duplicates()
+        return
+    
     try:
         # 如果没有通过命令行参数指定，使用默认值
         requirements = args.requirements or "写一篇关于人工智能在日常生活中的应用的文章"
@@ -77,25 +152,65 @@ def start_cli():
         print(f"字数：{word_count}")
         print(f"水印：{watermark}")
         
-        # 1. 生成文章内容
         article_gen = ArticleGenerator()
-        article_content = article_gen.generate(requirements, word_count)
-        logger.info("文章内容生成完成")
+        image_gen = ImageGenerator()
         
-        # 显示文章内容
-        display_article(article_content)
+        use_sections = args.sections or (
+            not args.stream and article_gen.should_use_sections(word_count)
+        )
+        name = datetime.now().strftime("%Y%m%d_%H%M%S")
         
-        print("正在生成配图...")
-        # 2. 生成配图
-        image_gen = ImageGenerator()
-        image_paths = image_gen.generate(article_content, watermark_text=watermark)
+        if use_sections:
+            # 1. 先生成大纲，再并发生成各小节
+            print("正在生成大纲并分段生成...")
+            article_content = article_gen.generate_sectioned(
+                requirements, word_count, use_cache=not args.no_cache
+            )
+            article_content, duplicate_index = check_duplicate(name, article_content, lambda: article_gen.generate_sectioned(
+                requirements, word_count, use_cache=False
+            ))
+            logger.info("文章内容生成完成")
+            display_article(article_content)
+            
+            print("正在生成配图...")
+            # 2. 生成配图
+            image_paths = image_gen.generate(article_content, watermark_text=watermark)
+        elif args.stream:
+            # 1+2. 流式生成文章内容，同时生成配图
+            article_content, image_paths = generate_streaming(
+                article_gen, image_gen, requirements, word_count, watermark,
+                use_cache=not args.no_cache
+            )
+            # 段落已经显示、配图已经生成，重复时只做标记
+            article_content, duplicate_index = check_duplicate(name, article_content)
+            logger.info("文章内容生成完成")
+        else:
+            # 1. 生成文章内容
+            article_content = article_gen.generate(
+                requirements, word_count, use_cache=not args.no_cache
+            )
+            article_content, duplicate_index = check_duplicate(name, article_content, lambda: article_gen.generate(
+                requirements, word_count, use_cache=False
+            ))
+            logger.info("文章内容生成完成")
+            
+            # 显示文章内容
+            display_article(article_content)
+            
+            print("正在生成配图...")
+            # 2. 生成配图
+            image_paths = image_gen.generate(article_content, watermark_text=watermark)
         logger.info(f"生成了 {len(image_paths)} 张配图")
         
         print("正在生成文档...")
         # 3. 生成文档
         doc_writer = DocumentWriter()
-        doc_path = doc_writer.create_document(article_content, image_paths)
+        doc_path = doc_writer.create_document(article_content, image_paths, name)
         logger.info(f"文档已生成: {doc_path}")
+        if duplicate_index is not None:
+            # 文档生成成功后才加入查重索引
+            duplicate_index.commit(name)
+            duplicate_index.save()
         
         print(f"\n文章生成成功！")
         print(f"文档保存路径：{doc_path}")
@@ -106,5 +221,160 @@ def start_cli():
         print(f"\n错误：{str(e)}")
         print("请检查配置文件和日志文件以获取详细信息。")
 
+def check_duplicate(name, article_content, regenerate=None):
+    """
+    与已生成的文章查重，近似重复时按配置项 duplicate_policy 重新生成（regenerate）或只做标记（flag）
+    采用的文章只在索引中预留，文档生成成功后再由调用方加入（commit）
+    :param name: 文章名（与文档名一致）
+    :param regenerate: 重新生成文章的函数，为None时只做标记
+    :return: (最终采用的文章内容, 查重索引)，未开启查重时索引为None
+    """
+    config = Config()
+    if not config.get('duplicate_check', True):
+        return article_content, None
+    from duplicate_index import DuplicateIndex
+    
+    duplicate_index = DuplicateIndex()
+    retries = 0
+    if regenerate and config.get('duplicate_policy', 'flag') == 'regenerate':
+        retries = config.get('duplicate_max_retries', 2)
+    for attempt in range(retries + 1):
+        # 最后一次仍然重复时也预留，文章照常发布
+        final = attempt == retries
+        duplicate = duplicate_index.reserve(name, article_content, final)
+        if duplicate is None:
+            break
+        print(f"\n警告：文章与已生成的文章 {duplicate[0]} 近似重复（相似度{duplicate[1]}）"
+              + ("" if final else "，正在重新生成..."))
+        if not final:
+            article_content = regenerate()
+    return article_content, duplicate_index
+
+def start_batch(args):
+    """
+    批量模式：读取关键词文件，并发生成多篇文章
+    """
+    from batch_runner import BatchRunner
+    logger = logging.getLogger(__name__)
+    
+    try:
+        jobs = BatchRunner.load_jobs(args.batch, args.word_count or 1000)
+        if not jobs:
+            print(f"\n关键词文件中没有可用的任务：{args.batch}")
+            return
+        
+        runner = BatchRunner(
+            concurrency=args.concurrency,
+            watermark_text=args.watermark or "版权所有",
+            with_images=not args.no_images,
+            use_cache=not args.no_cache
+        )
+        print(f"\n开始批量生成，共{len(jobs)}篇，并发数：{runner.concurrency}")
+        try:
+            result_path = runner.run(jobs)
+        finally:
+            runner.close()
+        
+        print(f"\n批量生成结束！")
+        print(f"结果文件：{result_path}")
+        
+    except Exception as e:
+        logger.error(f"批量生成失败: {str(e)}")
+        print(f"\n错误：{str(e)}")
+        print("请检查配置文件和日志文件以获取详细信息。")
+
+def start_republish(args):
+    """
+    重新发布：对编辑修改过的文章（.source.md，SEO优化前的原文）重新做SEO优化、配图和生成文档，
+    按文章清单复用未变化段落的分析结果和配图，文档名与原文章相同
+    """
+    from seo_optimizer import SEOOptimizer
+    from article_manifest import ArticleManifest
+    from link_index import RelatedArticleIndex, strip_related
+    logger = logging.getLogger(__name__)
+    
+    try:
+        seo_opt = SEOOptimizer()
+        link_index = None
+        if Config().get('internal_links', True):
+            link_index = RelatedArticleIndex()
+            link_index.update()
+        image_gen = None if args.no_images else ImageGenerator()
+        doc_writer = DocumentWriter()
+        watermark = args.watermark or "版权所有"
+        
+        for path in args.republish:
+            started = time.monotonic()
+            base = os.path.splitext(path)[0]
+            if base.endswith('.source'):
+                base = base[:-len('.source')]
+            elif os.path.exists(base + DocumentWriter.SOURCE_SUFFIX):
+                # .md 正文是发布的内容（已做过关键词调整），从原文重新优化
+                logger.info(f"使用SEO优化前的原文重新发布：{base + DocumentWriter.SOURCE_SUFFIX}")
+                path = base + DocumentWriter.SOURCE_SUFFIX
+            name = os.path.basename(base)
+            if name.startswith('article_'):
+                name = name[len('article_'):]
+            with open(path, 'r', encoding='utf-8') as f:
+                content = strip_related(f.read())
+            
+            manifest = ArticleManifest(name)
+            optimized_content = seo_opt.optimize(content, manifest)
+            if link_index is not None:
+                optimized_content = link_index.add_links(optimized_content, name)
+            image_paths = []
+            if image_gen:
+                image_paths = image_gen.generate(optimized_content, watermark_text=watermark, manifest=manifest)
+            doc_path = doc_writer.create_document(optimized_content, image_paths, name, manifest, content)
+            manifest.save()
+            if link_index is not None:
+                link_index.add_document(name, optimized_content, doc_path)
+            
+            print(f"\n已重新发布：{doc_path}（复用{manifest.hits}项，重新处理{manifest.misses}项，"
+                  f"耗时{time.monotonic() - started:.2f}秒）")
+        
+        if link_index is not None:
+            link_index.save()
+        
+    except Exception as e:
+        logger.error(f"重新发布失败: {str(e)}")
+        print(f"\n错误：{str(e)}")
+        print("请检查配置文件和日志文件以获取详细信息。")
+
+def start_index_duplicates():
+    """
+    将输出目录中已有的文章加入近似重复检查索引
+    """
+    from duplicate_index import DuplicateIndex
+    logger = logging.getLogger(__name__)
+    
+    try:
+        duplicate_index = DuplicateIndex()
+        added = duplicate_index.add_directory()
+        duplicate_index.save()
+        print(f"\n查重索引：共{len(duplicate_index)}篇文章（本次新增{added}篇）")
+        
+    except Exception as e:
+        logger.error(f"建立查重索引失败: {str(e)}")
+        print(f"\n错误：{str(e)}")
+
+def start_corpus_report():
+    """
+    语料分析：增量更新已生成文章的索引并输出报告
+    """
+    from corpus_analytics import CorpusIndex
+    logger = logging.getLogger(__name__)
+    
+    try:
+        corpus = CorpusIndex()
+        updated = corpus.update()
+        print(f"\n语料索引：共{len(corpus.docs)}篇文章（本次新增/更新{updated}篇），{len(corpus.terms)}个词")
+        for path in corpus.write_reports():
+            print(f"报告文件：{path}")
+        
+    except Exception as e:
+        logger.error(f"语料分析失败: {str(e)}")
+        print(f"\n错误：{str(e)}")
+
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -1,136 +1,225 @@
+import logging
 import re
-from collections import Counter
+import threading
+from article_analysis import ArticleAnalysis
+from utils.aho_corasick import AhoCorasick
+from utils.cache import DiskCache
+from utils.config import Config
+
+META_START = '<!--SEO Meta Tags-->'
+META_END = '<!--End SEO Meta Tags-->'
+
+def strip_meta_tags(content):
+    """
+    去掉 SEOOptimizer 在文首加入的META信息，其余内容保持不变（段落序号与优化前一致）
+    """
+    lines = content.split('\n')
+    start_idx = -1
+    end_idx = -1
+    
+    for i, line in enumerate(lines):
+        if META_START in line:
+            start_idx = i
+        elif META_END in line:
+            end_idx = i
+            break
+    
+    if start_idx != -1 and end_idx != -1:
+        return '\n'.join(lines[:start_idx] + lines[end_idx + 1:])
+    return content
 
 class SEOOptimizer:
-    def optimize(self, content):
+    TARGET_DENSITY = 2.5  # 关键词密度过高时替换到该密度（%）
+    
+    # 内置同义词表，可通过配置项 synonyms_file 扩充
+    DEFAULT_SYNONYMS = {
+        '技术': ['科技', '工艺', '方法'],
+        '智能': ['智慧', '聪明', '智囊'],
+        '系统': ['平台', '框架', '体系'],
+        '开发': ['研发', '创建', '构建'],
+        '应用': ['使用', '运用', '实施']
+    }
+    _synonyms = None
+    _synonyms_lock = threading.Lock()
+    
+    def __init__(self, idf_weights=None):
+        """
+        :param idf_weights: 可选，语料库中各词的IDF（CorpusIndex.idf_weights），
+                            提供时优先选择在已有文章中较少使用的关键词，减少关键词蚕食
+        """
+        self.idf_weights = idf_weights
+    
+    def optimize(self, content, manifest=None):
         """
         对文章内容进行SEO优化
+        文章只分析一次，各步骤共享同一个分析结果并在修改段落时增量更新
+        :param manifest: 可选，ArticleManifest，重新发布修改过的文章时复用未变化段落的分词和调整结果
         """
-        optimized_content = self._optimize_keywords(content)
-        optimized_content = self._optimize_structure(optimized_content)
-        optimized_content = self._add_meta_tags(optimized_content)
+        analysis = ArticleAnalysis(content, manifest)
+        self._optimize_keywords(analysis)
+        self._optimize_structure(analysis)
         
-        return optimized_content
+        return self._add_meta_tags(analysis)
     
-    def _optimize_keywords(self, content):
+    def _optimize_keywords(self, analysis):
         """
         优化关键词密度，保持在2%-3%之间
+        所有关键词的增减在一次扫描中完成
         """
         # 分析当前关键词密度
-        words = re.findall(r'\w+', content.lower())
-        word_count = len(words)
-        word_freq = Counter(words)
+        word_count = analysis.word_count
+        word_freq = analysis.frequencies
+        synonyms = self.get_synonyms()
         
-        # 获取频率最高的词作为关键词
-        keywords = [word for word, count in word_freq.most_common(5)
-                   if len(word) > 1]  # 排除单字词
+        # 获取频率最高的词作为关键词（排除单字词）
+        keywords = analysis.top_keywords(5, self.idf_weights)
         
         # 调整关键词密度
+        additions = []
+        reductions = {}
         for keyword in keywords:
             current_density = word_freq[keyword] / word_count * 100
             if current_density < 2:
                 # 增加关键词出现次数
-                content = self._add_keywords(content, keyword)
-            elif current_density > 3:
-                # 减少关键词出现次数
-                content = self._reduce_keywords(content, keyword)
+                additions.append(keyword)
+            elif current_density > 3 and synonyms.get(keyword):
+                # 减少关键词出现次数：按比例替换为同义词，使密度回到目标区间中间
+                reductions[keyword] = 1 - self.TARGET_DENSITY / current_density
         
-        return content
+        if additions or reductions:
+            self._adjust_keywords(analysis, additions, reductions, synonyms)
     
-    def _optimize_structure(self, content):
+    def _optimize_structure(self, analysis):
         """
         优化文章结构，确保层次分明
         """
         # 分析并调整标题层级
-        lines = content.split('\n')
         current_level = 0
-        structured_lines = []
+        for heading in analysis.headings():
+            level = heading.level
+            if level - current_level > 1:
+                # 调整标题层级
+                analysis.set_heading_level(heading, current_level + 1)
+            current_level = level
         
-        for line in lines:
-            if line.strip().startswith('#'):
-                level = len(re.match(r'^#+', line).group())
-                if level - current_level > 1:
-                    # 调整标题层级
-                    line = '#' * (current_level + 1) + line[level:]
-                current_level = level
-            structured_lines.append(line)
-        
-        # 确保段落长度适中
-        content = '\n'.join(structured_lines)
-        paragraphs = re.split(r'\n\s*\n', content)
-        optimized_paragraphs = []
-        
-        for para in paragraphs:
+        # 确保段落长度适中，从后往前拆分，不影响前面段落的序号
+        for i in range(len(analysis.paragraphs) - 1, -1, -1):
+            para = analysis.paragraphs[i]
             if len(para.strip()) > 500:  # 段落过长
                 sentences = re.split(r'[。！？]', para)
                 mid = len(sentences) // 2
-                para = '。'.join(sentences[:mid]) + '。\n\n' + \
-                       '。'.join(sentences[mid:]) + '。'
-            optimized_paragraphs.append(para)
-        
-        return '\n\n'.join(optimized_paragraphs)
+                analysis.replace_paragraph(i, [
+                    '。'.join(sentences[:mid]) + '。',
+                    '。'.join(sentences[mid:]) + '。'
+                ])
     
-    def _add_meta_tags(self, content):
+    def _add_meta_tags(self, analysis):
         """
         添加SEO相关的META信息
         """
         # 提取标题
-        title_match = re.search(r'^#\s+(.+)$', content, re.MULTILINE)
-        if title_match:
-            title = title_match.group(1)
-        else:
-            title = "SEO优化文章"
+        title = analysis.title() or "SEO优化文章"
         
         # 提取描述
-        first_para = re.search(r'\n\n([^#\n].+?)\n\n', content)
-        description = first_para.group(1) if first_para else title
+        description = analysis.description() or title
         
         # 提取关键词
-        words = re.findall(r'\w+', content.lower())
-        word_freq = Counter(words)
-        keywords = ', '.join(word for word, _ in word_freq.most_common(5)
-                           if len(word) > 1)
+        keywords = ', '.join(analysis.top_keywords(5, self.idf_weights))
         
         # 添加META标签
-        meta_tags = f"""<!--SEO Meta Tags-->
+        meta_tags = f"""{META_START}
 <title>{title}</title>
 <meta name=\"description\" content=\"{description[:200]}\">
 <meta name=\"keywords\" content=\"{keywords}\">
-<!--End SEO Meta Tags-->
+{META_END}
 
 """
         
-        return meta_tags + content
+        return meta_tags + analysis.text()
     
-    def _add_keywords(self, content, keyword):
+    def _adjust_keywords(self, analysis, additions, reductions, synonyms):
         """
-        增加关键词出现频率
+        用多模式自动机逐段扫描一次，同时完成关键词的增加和同义词替换
+        :param additions: 需要增加出现次数的关键词
+        :param reductions: 需要减少的关键词 -> 替换比例
+        :param synonyms: 同义词表
         """
-        paragraphs = content.split('\n\n')
-        for i in range(len(paragraphs)):
-            if i % 3 == 0 and keyword not in paragraphs[i].lower():
-                sentences = paragraphs[i].split('。')
-                if len(sentences) > 1:
-                    sentences.insert(1, f"关于{keyword}，")
-                    paragraphs[i] = '。'.join(sentences)
-        return '\n\n'.join(paragraphs)
+        matcher = None
+        # 按比例均匀替换：累计值达到1时替换一次
+        progress = dict.fromkeys(reductions, 0.0)
+        rotation = dict.fromkeys(reductions, 0)
+        
+        manifest = analysis.manifest
+        if manifest is not None:
+            # 'overlap'：关键词按重叠匹配判断是否出现，之前保存的调整结果不再复用
+            plan = DiskCache.make_key('overlap', additions, reductions,
+                                      {keyword: synonyms[keyword] for keyword in reductions})
+        
+        def replace(start, keyword):
+            if keyword not in reductions:
+                return None
+            progress[keyword] += reductions[keyword]
+            if progress[keyword] < 1:
+                return None
+            progress[keyword] -= 1
+            choices = synonyms[keyword]
+            rotation[keyword] += 1
+            return choices[(rotation[keyword] - 1) % len(choices)]
+        
+        for i, para in enumerate(analysis.paragraphs):
+            add_here = bool(additions) and i % 3 == 0
+            if manifest is not None:
+                # 段落的调整结果只取决于段落内容、是否插入关键词和替换进度
+                key = DiskCache.make_key(plan, manifest.paragraph_hash(para), add_here, progress, rotation)
+                cached = manifest.get('adjusted', key)
+                if cached is not None:
+                    text, progress_after, rotation_after = cached
+                    progress.update(progress_after)
+                    rotation.update(rotation_after)
+                    analysis.update_paragraph(i, text)
+                    continue
+            
+            if matcher is None:
+                matcher = AhoCorasick(list(additions) + list(reductions))
+            lowered = analysis.lowered[i]
+            # 大小写转换改变长度时（极少见）按原文匹配
+            matches = matcher.finditer(lowered if len(lowered) == len(para) else para)
+            
+            text = para
+            if reductions:
+                # 关键词为小写，只替换原文中大小写一致的出现
+                text = matcher.replace(para, lambda start, keyword: replace(start, keyword)
+                                       if para.startswith(keyword, start) else None, matches)
+            
+            if add_here:
+                # finditer只返回不重叠的匹配，包含在较长关键词中的关键词（如“人工智能”中的“智能”）需按重叠匹配判断
+                found = {keyword for _, keyword in matcher.iter_all(lowered if len(lowered) == len(para) else para)}
+                missing = [keyword for keyword in additions if keyword not in found]
+                sentences = text.split('。')
+                if missing and len(sentences) > 1:
+                    sentences[1:1] = [f"关于{keyword}，" for keyword in reversed(missing)]
+                    text = '。'.join(sentences)
+            
+            if manifest is not None:
+                manifest.put('adjusted', key, [text, dict(progress), dict(rotation)])
+            analysis.update_paragraph(i, text)
     
-    def _reduce_keywords(self, content, keyword):
+    @classmethod
+    def get_synonyms(cls):
         """
-        减少关键词出现频率
+        同义词表：内置词表加上配置项 synonyms_file 指定的词表，进程内只加载一次
+        词表每行一个关键词及其同义词，以空格或逗号分隔，例如：技术 科技 工艺 方法
         """
-        # 使用同义词替换部分关键词
-        synonyms = {
-            '技术': ['科技', '工艺', '方法'],
-            '智能': ['智慧', '聪明', '智囊'],
-            '系统': ['平台', '框架', '体系'],
-            '开发': ['研发', '创建', '构建'],
-            '应用': ['使用', '运用', '实施']
-        }
-        
-        if keyword in synonyms:
-            for synonym in synonyms[keyword]:
-                content = content.replace(keyword, synonym, 
-                                        content.count(keyword) // 3)
-        
-        return content
\ No newline at end of file
+        with cls._synonyms_lock:
+            if cls._synonyms is None:
+                synonyms = dict(cls.DEFAULT_SYNONYMS)
+                path = Config().get('synonyms_file')
+                if path:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        for line in f:
+                            words = [word for word in re.split(r'[\s,，]+', line.strip()) if word]
+                            if len(words) > 1 and not words[0].startswith('#'):
+                                synonyms[words[0].lower()] = words[1:]
+                    logging.getLogger(__name__).info(f"已加载同义词表：{path}（共{len(synonyms)}个词）")
+                cls._synonyms = synonyms
+            return cls._synonyms
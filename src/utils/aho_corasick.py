@@ -0,0 +1,104 @@
+"""
+Aho–Corasick多模式匹配：一次扫描文本找出所有关键词，耗时与文本长度成正比，与模式数量无关
+"""
+from collections import deque
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+class AhoCorasick:
+    def __init__(self, patterns: Iterable[str]):
+        """
+        :param patterns: 模式串，空串会被忽略
+        """
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.terminal: List[Optional[str]] = [None]  # 以该状态结尾的模式
+        self.output: List[int] = [0]  # 沿失败链最近的终止状态（0表示没有）
+
+        for pattern in patterns:
+            if pattern:
+                self._insert(pattern)
+        self._build()
+
+    def _insert(self, pattern: str):
+        state = 0
+        for char in pattern:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][char] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.terminal.append(None)
+                self.output.append(0)
+            state = next_state
+        self.terminal[state] = pattern
+
+    def _build(self):
+        """
+        按广度优先计算失败指针和输出链接
+        """
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.goto[state].items():
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                link = self.fail[child]
+                self.output[child] = link if self.terminal[link] is not None else self.output[link]
+                queue.append(child)
+
+    def iter_all(self, text: str) -> Iterator[Tuple[int, str]]:
+        """
+        返回所有（可能重叠的）匹配，按结束位置排列
+        :return: (起始位置, 模式串)
+        """
+        goto, fail, terminal, output = self.goto, self.fail, self.terminal, self.output
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            match = state if terminal[state] is not None else output[state]
+            while match:
+                pattern = terminal[match]
+                yield index - len(pattern) + 1, pattern
+                match = output[match]
+
+    def finditer(self, text: str) -> List[Tuple[int, str]]:
+        """
+        返回不重叠的匹配，重叠时取最左边、其次最长的
+        :return: [(起始位置, 模式串)]，按位置排列
+        """
+        matches = sorted(self.iter_all(text), key=lambda item: (item[0], -len(item[1])))
+        selected = []
+        position = 0
+        for start, pattern in matches:
+            if start >= position:
+                selected.append((start, pattern))
+                position = start + len(pattern)
+        return selected
+
+    def replace(self, text: str, replacement: Callable[[int, str], Optional[str]],
+                matches: Optional[List[Tuple[int, str]]] = None) -> str:
+        """
+        一次扫描替换文本中的匹配
+        :param replacement: 回调(起始位置, 模式串)，返回替换文字，返回None表示保留原文
+        :param matches: 已经求出的 finditer 结果，可避免重复扫描
+        """
+        if matches is None:
+            matches = self.finditer(text)
+        parts = []
+        position = 0
+        for start, pattern in matches:
+            new_text = replacement(start, pattern)
+            if new_text is None:
+                continue
+            parts.append(text[position:start])
+            parts.append(new_text)
+            position = start + len(pattern)
+        if not parts:
+            return text
+        parts.append(text[position:])
+        return ''.join(parts)
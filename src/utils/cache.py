@@ -0,0 +1,199 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+from utils.config import Config
+
+class DiskCache:
+    """
+    基于内容哈希的磁盘缓存
+    每个条目一个文件，按最近访问时间做LRU淘汰，同时支持总大小和过期时间限制
+    文件的修改时间即写入时间（用于过期判断），访问时间记录最近一次命中（用于LRU）
+    """
+    def __init__(self, name: str, max_bytes: Optional[int] = None,
+                 max_age: Optional[float] = None, suffix: str = '.bin'):
+        """
+        :param name: 缓存名称，对应缓存目录下的子目录
+        :param max_bytes: 缓存总大小上限（字节），None表示不限制
+        :param max_age: 条目自写入起的最长保留时间（秒），命中不会延长，None表示不过期
+        :param suffix: 缓存文件后缀
+        """
+        self.config = Config()
+        self.logger = logging.getLogger(__name__)
+        self.cache_dir = Path(self.config.get('cache_dir', 'cache')) / name
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._index = OrderedDict()  # key -> 文件大小，按访问时间从旧到新排列
+        self._total_bytes = 0
+        self._load_index()
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        """
+        根据任意可JSON序列化的内容生成缓存键
+        """
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        读取缓存，未命中或已过期时返回None
+        """
+        with self._lock:
+            path = self._lookup(key)
+        if path is None:
+            return None
+        try:
+            return path.read_bytes()
+        except OSError:
+            # 读取前恰好被其他线程淘汰
+            return None
+
+    def get_path(self, key: str) -> Optional[Path]:
+        """
+        返回缓存文件路径（不读取内容），适合图片等较大的条目
+        """
+        with self._lock:
+            return self._lookup(key)
+
+    def put(self, key: str, data: bytes):
+        """
+        写入缓存，先写临时文件再原子替换，避免并发读到半个文件
+        """
+        tmp_path = self.temp_path(key)
+        tmp_path.write_bytes(data)
+        self.put_file(key, tmp_path)
+
+    def put_file(self, key: str, src_path) -> Path:
+        """
+        将已写好的文件移动到缓存中（同一文件系统内为原子操作）
+        :param src_path: 源文件路径，建议使用 temp_path 生成
+        :return: 缓存文件路径
+        """
+        path = self._path_for(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(src_path, path)
+        size = path.stat().st_size
+
+        with self._lock:
+            self._total_bytes -= self._index.pop(key, 0)
+            self._index[key] = size
+            self._total_bytes += size
+            self._evict()
+        return path
+
+    def temp_path(self, key: str) -> Path:
+        """
+        生成缓存目录下的唯一临时文件路径，写完后通过 put_file 提交
+        """
+        path = self._path_for(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+
+    def get_text(self, key: str) -> Optional[str]:
+        data = self.get(key)
+        return data.decode('utf-8') if data is not None else None
+
+    def put_text(self, key: str, text: str):
+        self.put(key, text.encode('utf-8'))
+
+    def stats(self) -> dict:
+        """
+        返回缓存统计信息
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'entries': len(self._index),
+                'bytes': self._total_bytes
+            }
+
+    def _lookup(self, key: str) -> Optional[Path]:
+        """
+        查找缓存条目并更新访问时间与命中统计，需在持有锁时调用
+        """
+        path = self._path_for(key)
+        if key not in self._index or self._is_expired(path):
+            self._discard(key)
+            self.misses += 1
+            return None
+        try:
+            # 只更新访问时间，修改时间保持为写入时间
+            os.utime(path, (time.time(), path.stat().st_mtime))
+        except OSError:
+            self._discard(key)
+            self.misses += 1
+            return None
+        self._index.move_to_end(key)
+        self.hits += 1
+        return path
+
+    def _path_for(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}{self.suffix}"
+
+    def _is_expired(self, path: Path) -> bool:
+        if self.max_age is None:
+            return False
+        try:
+            return time.time() - path.stat().st_mtime > self.max_age
+        except OSError:
+            return True
+
+    def _load_index(self):
+        """
+        启动时扫描缓存目录，按访问时间重建LRU顺序
+        """
+        entries = []
+        for path in self.cache_dir.glob(f"*/*{self.suffix}"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_atime, path.name[:-len(self.suffix)], stat.st_size))
+
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total_bytes += size
+
+        with self._lock:
+            self._evict()
+
+    def _discard(self, key: str):
+        size = self._index.pop(key, None)
+        if size is None:
+            return
+        self._total_bytes -= size
+        try:
+            self._path_for(key).unlink()
+        except OSError:
+            pass
+
+    def _evict(self):
+        """
+        淘汰过期条目以及超出总大小上限的最久未访问条目
+        """
+        if self.max_age is not None:
+            while self._index:
+                oldest = next(iter(self._index))
+                if not self._is_expired(self._path_for(oldest)):
+                    break
+                self._discard(oldest)
+
+        if self.max_bytes is not None:
+            while self._total_bytes > self.max_bytes and self._index:
+                self._discard(next(iter(self._index)))
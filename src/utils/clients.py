@@ -0,0 +1,78 @@
+"""
+进程内共享的HTTP客户端注册表
+每个主机一个保持长连接的 requests.Session，OpenAI客户端按 (base_url, api_key) 复用，
+避免每篇文章、每张图片都重新建立TCP+TLS连接
+"""
+import threading
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from openai import OpenAI, AsyncOpenAI
+from utils.config import Config
+
+_lock = threading.Lock()
+_sessions = {}
+_openai_clients = {}
+
+def get_http_timeout():
+    """
+    返回 requests 使用的 (连接超时, 读取超时)，单位秒
+    """
+    config = Config()
+    return (config.get('http_connect_timeout', 10), config.get('http_read_timeout', 120))
+
+def get_http_session(url):
+    """
+    获取目标主机对应的长连接会话
+    :param url: 请求地址或主机名
+    :return: requests.Session
+    """
+    host = urlparse(url).netloc or url
+    with _lock:
+        session = _sessions.get(host)
+        if session is None:
+            pool_size = Config().get('http_pool_size', 16)
+            # 重试由调用方结合限流器处理，这里不做自动重试
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _sessions[host] = session
+        return session
+
+def get_openai_client(base_url, api_key, async_client=False):
+    """
+    获取复用的OpenAI兼容客户端
+    异步客户端绑定首次使用时的事件循环，只应在同一个事件循环内复用
+    :param base_url: 接口地址
+    :param api_key: API密钥
+    :param async_client: 是否返回 AsyncOpenAI
+    """
+    key = (base_url, api_key, async_client)
+    with _lock:
+        client = _openai_clients.get(key)
+        if client is None:
+            config = Config()
+            client_cls = AsyncOpenAI if async_client else OpenAI
+            # 重试由生成器统一处理并经过限流器，关闭SDK内置重试
+            client = client_cls(
+                base_url=base_url,
+                api_key=api_key,
+                max_retries=0,
+                timeout=config.get('openai_timeout', 600)
+            )
+            _openai_clients[key] = client
+        return client
+
+def close_all():
+    """
+    关闭所有同步会话和客户端，程序退出前调用
+    """
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        for (_, _, async_client), client in _openai_clients.items():
+            if not async_client:
+                client.close()
+        _sessions.clear()
+        _openai_clients.clear()
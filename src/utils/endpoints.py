@@ -0,0 +1,132 @@
+import logging
+import math
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import List, Optional
+from utils.config import Config
+
+@dataclass
+class Endpoint:
+    """
+    一个OpenAI兼容的接口地址及其健康状态
+    延迟按每1000个预算token的耗时记录，便于不同字数的请求相互比较
+    """
+    name: str
+    base_url: str
+    api_key: str
+    model: str
+    order: int = 0
+    latencies: deque = field(default_factory=lambda: deque(maxlen=200))
+    consecutive_failures: int = 0
+    cooldown_until: float = 0.0
+
+    def is_healthy(self, now: float) -> bool:
+        return now >= self.cooldown_until
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)]
+
+
+class EndpointPool:
+    """
+    多接口路由：按健康状态和延迟排序选择接口，并根据历史延迟分位数决定对冲请求的发起时机
+    """
+    def __init__(self, endpoints: List[Endpoint], hedge_enabled=True, hedge_quantile=0.95,
+                 hedge_min_samples=5, failure_threshold=3, cooldown=30.0):
+        self.endpoints = endpoints
+        self.hedge_enabled = hedge_enabled
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+
+    def ranked(self) -> List[Endpoint]:
+        """
+        返回按优先级排序的接口列表：
+        健康的在前，其中连续失败次数少、延迟中位数低的优先；
+        尚无延迟数据的接口排在有数据的之后（通过对冲请求积累数据），同等条件按配置顺序
+        所有接口都在冷却中时仍返回全部，避免无接口可用
+        """
+        now = time.monotonic()
+        with self._lock:
+            healthy = [ep for ep in self.endpoints if ep.is_healthy(now)]
+            cooling = [ep for ep in self.endpoints if not ep.is_healthy(now)]
+
+            def priority(ep):
+                median = ep.quantile(0.5)
+                return (ep.consecutive_failures, median if median is not None else math.inf, ep.order)
+
+            return sorted(healthy, key=priority) + sorted(cooling, key=lambda ep: ep.cooldown_until)
+
+    def hedge_delay(self, endpoint: Endpoint, budget_tokens: int) -> Optional[float]:
+        """
+        对冲等待时间：主请求超过该接口历史延迟的分位数仍未完成时，向下一个接口再发一次
+        样本不足、未启用对冲或只有一个接口时返回None
+        """
+        if not self.hedge_enabled or len(self.endpoints) < 2:
+            return None
+        with self._lock:
+            if not endpoint.latencies or len(endpoint.latencies) < self.hedge_min_samples:
+                return None
+            per_k = endpoint.quantile(self.hedge_quantile)
+        return per_k * max(budget_tokens, 1) / 1000
+
+    def record_success(self, endpoint: Endpoint, latency: float, budget_tokens: int):
+        with self._lock:
+            endpoint.latencies.append(latency * 1000 / max(budget_tokens, 1))
+            endpoint.consecutive_failures = 0
+            endpoint.cooldown_until = 0.0
+
+    def record_failure(self, endpoint: Endpoint):
+        with self._lock:
+            endpoint.consecutive_failures += 1
+            if endpoint.consecutive_failures >= self.failure_threshold:
+                endpoint.cooldown_until = time.monotonic() + self.cooldown
+                self.logger.warning(f"接口 {endpoint.name} 连续失败{endpoint.consecutive_failures}次，"
+                                    f"暂停使用{self.cooldown:.0f}秒")
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_endpoint_pool(default_base_url: str, default_model: str, default_api_key: str) -> EndpointPool:
+    """
+    获取进程内共享的接口池，读取配置项 endpoints 和 hedging，未配置时只包含默认接口
+    例如：
+    endpoints:
+      - {name: ppinfra, base_url: 'https://api.ppinfra.com/v3/openai', model: 'deepseek/deepseek-r1/community'}
+      - {name: backup, base_url: 'https://example.com/v1', api_key: 'sk-...', model: 'deepseek-r1'}
+    hedging: {enabled: true, quantile: 0.95, min_samples: 5}
+    """
+    key = (default_base_url, default_model, default_api_key)
+    with _pools_lock:
+        if key not in _pools:
+            config = Config()
+            endpoint_configs = config.get('endpoints') or [{}]
+            endpoints = [
+                Endpoint(
+                    name=item.get('name') or item.get('base_url') or 'default',
+                    base_url=item.get('base_url', default_base_url),
+                    api_key=item.get('api_key', default_api_key),
+                    model=item.get('model', default_model),
+                    order=order
+                )
+                for order, item in enumerate(endpoint_configs)
+            ]
+            hedging = config.get('hedging') or {}
+            _pools[key] = EndpointPool(
+                endpoints,
+                hedge_enabled=hedging.get('enabled', True),
+                hedge_quantile=hedging.get('quantile', 0.95),
+                hedge_min_samples=hedging.get('min_samples', 5),
+                failure_threshold=hedging.get('failure_threshold', 3),
+                cooldown=hedging.get('cooldown', 30)
+            )
+        return _pools[key]
@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+from utils.config import Config
+
+class TokenBucket:
+    """
+    令牌桶：按每分钟速率匀速补充，允许预留出负余额，
+    调用方根据返回的等待时间自行sleep，因此同步线程和协程都可以使用
+    """
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def reserve(self, amount: float, now: float) -> float:
+        """
+        预留令牌，返回需要等待的秒数
+        """
+        self._refill(now)
+        # 单次请求超过桶容量时按容量计，避免永远等不到
+        self.tokens -= min(amount, self.capacity)
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def available(self, amount: float, now: float) -> bool:
+        """
+        当前余额是否足够，不扣减
+        """
+        self._refill(now)
+        return self.tokens >= min(amount, self.capacity)
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def refund(self, amount: float):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class RateLimiter:
+    """
+    单个服务商的限流器：请求数/分钟和token数/分钟两个令牌桶，
+    并记录服务端通过Retry-After要求的暂停时间，进程内所有并发任务共享
+    """
+    def __init__(self, name: str, requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None):
+        self.name = name
+        self.logger = logging.getLogger(__name__)
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: int = 0) -> float:
+        """
+        为一次请求预留额度，返回需要等待的秒数
+        :param tokens: 预计消耗的token数
+        """
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self.paused_until - now)
+            if self.request_bucket:
+                wait = max(wait, self.request_bucket.reserve(1, now))
+            if self.token_bucket and tokens:
+                wait = max(wait, self.token_bucket.reserve(tokens, now))
+            return wait
+
+    def try_acquire(self, tokens: int = 0) -> bool:
+        """
+        仅在无需等待时占用额度，用于对冲请求等可选的额外请求
+        :return: 是否成功占用
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self.paused_until > now:
+                return False
+            if self.request_bucket and not self.request_bucket.available(1, now):
+                return False
+            if self.token_bucket and tokens and not self.token_bucket.available(tokens, now):
+                return False
+            if self.request_bucket:
+                self.request_bucket.reserve(1, now)
+            if self.token_bucket and tokens:
+                self.token_bucket.reserve(tokens, now)
+            return True
+
+    def acquire(self, tokens: int = 0):
+        """
+        阻塞直到可以发起请求
+        """
+        wait = self.reserve(tokens)
+        if wait > 0:
+            self.logger.info(f"{self.name} 限流等待 {wait:.2f} 秒")
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: int = 0):
+        """
+        异步等待直到可以发起请求
+        """
+        wait = self.reserve(tokens)
+        if wait > 0:
+            self.logger.info(f"{self.name} 限流等待 {wait:.2f} 秒")
+            await asyncio.sleep(wait)
+
+    def settle(self, estimated: int, actual: Optional[int]):
+        """
+        请求完成后按实际消耗修正token桶，退回多预留的部分
+        """
+        if self.token_bucket and actual is not None and estimated > actual:
+            with self._lock:
+                self.token_bucket.refund(estimated - actual)
+
+    def pause(self, seconds: float):
+        """
+        服务端返回Retry-After时暂停所有共享该限流器的请求
+        """
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.logger.warning(f"{self.name} 触发服务端限流，暂停 {seconds:.2f} 秒")
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 60.0,
+                  retry_after: Optional[float] = None) -> float:
+    """
+    带随机抖动的指数退避（full jitter），服务端给出Retry-After时不早于该时间
+    :param attempt: 已失败次数（从0开始）
+    :param base: 基础间隔（秒）
+    :param cap: 最大间隔（秒）
+    :param retry_after: 服务端要求的等待时间（秒）
+    """
+    delay = random.uniform(0, min(cap, base * (2 ** attempt)))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+def parse_retry_after(headers) -> Optional[float]:
+    """
+    从响应头解析等待时间，支持 retry-after-ms、秒数以及HTTP日期格式
+    """
+    if not headers:
+        return None
+
+    value = headers.get('retry-after-ms')
+    if value:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+
+    value = headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def get_rate_limiter(provider: str) -> RateLimiter:
+    """
+    获取进程内共享的限流器，额度读取配置项 rate_limits.<provider>
+    例如：
+    rate_limits:
+      deepseek: {requests_per_minute: 60, tokens_per_minute: 200000}
+      flux: {requests_per_minute: 20}
+    """
+    with _limiters_lock:
+        if provider not in _limiters:
+            limits = (Config().get('rate_limits') or {}).get(provider) or {}
+            _limiters[provider] = RateLimiter(
+                provider,
+                requests_per_minute=limits.get('requests_per_minute'),
+                tokens_per_minute=limits.get('tokens_per_minute')
+            )
+        return _limiters[provider]
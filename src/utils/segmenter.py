@@ -0,0 +1,166 @@
+"""
+中文分词：词典前缀树 + 最大概率路径（动态规划）
+内置一个常用词和行业词的词典（约1700词）；已安装jieba时默认以jieba的词典（约35万词）为基础词典，
+可通过配置项 segmenter_dict 加载自定义词典，词典在进程内只加载一次，相同的中文片段只切分一次
+"""
+import importlib.util
+import logging
+import math
+import re
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional
+from utils.config import Config
+
+BUILTIN_DICT = Path(__file__).parent / 'segmenter_dict.txt'
+DEFAULT_WORD_FREQ = 3000  # 自定义词典未写频率时使用
+
+WORD_PATTERN = re.compile(r'\w+')
+CJK_PATTERN = re.compile(r'([一-鿿]+)')
+
+# 不作为关键词的常用虚词
+STOP_WORDS = frozenset("""
+我们 你们 他们 她们 它们 这个 那个 这些 那些 一个 没有 可以 因为 所以 但是 如果 虽然 而且 或者 以及
+还是 已经 正在 就是 不是 什么 怎么 为什么 如何 这样 那样 自己 大家 通过 进行 成为 需要 能够 应该 可能
+非常 更加 越来越 之一 之后 之前 同时 其中 其他 由于 对于 关于 根据 随着 目前 现在 一些 一种 各种 许多
+很多 所有 每个 不同 一定 一样 一起 一直 不断 不仅 只有 只要 只是 而是 然后 因此 此外 另外 首先 其次
+最后 总之 例如 比如 尤其 特别 甚至 即使 无论 不管 然而 并且 特别是 事实上 实际上 也就是说 换句话说
+总的来说 与此同时 除此之外 一方面 另一方面 或许 也许 大概 几乎 完全 十分 相当 比较 稍微 逐渐 逐步
+始终 总是 立即 马上 随时 同样 经常 偶尔 通常 the and for with that this are was from
+""".split())
+
+
+class Segmenter:
+    """
+    基于词频的中文分词器
+    词典保存为前缀表（扁平化的前缀树）：每个词的所有前缀都作为键，非词前缀的频率为0
+    """
+    def __init__(self, dict_paths: List[str] = (), base_dict: Optional[str] = None):
+        """
+        :param dict_paths: 自定义词典路径，每行“词 [频率]”，与jieba词典格式兼容
+        :param base_dict: 可选，基础词典（例如jieba的词典），内置词典只补充其中没有的词
+        """
+        self.logger = logging.getLogger(__name__)
+        self.prefixes: Dict[str, int] = {}
+        self.total = 0
+        if base_dict:
+            self.load_dict(base_dict)
+        self.load_dict(BUILTIN_DICT, override=not base_dict)
+        for path in dict_paths:
+            self.load_dict(path)
+        self._cut_cjk = lru_cache(maxsize=100000)(self._cut_cjk_uncached)
+
+    def load_dict(self, path, override: bool = True):
+        """
+        加载词典
+        :param override: 已有的词是否以新频率为准，为False时只加入新词
+        """
+        count = 0
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                parts = line.split()
+                if not parts or parts[0].startswith('#'):
+                    continue
+                word = parts[0].lower()
+                freq = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else DEFAULT_WORD_FREQ
+                if not override and self.prefixes.get(word):
+                    continue
+                self.add_word(word, freq)
+                count += 1
+        self.logger.info(f"已加载分词词典：{path}（{count}个词）")
+
+    def add_word(self, word: str, freq: int = DEFAULT_WORD_FREQ):
+        self.total += freq - self.prefixes.get(word, 0)
+        self.prefixes[word] = freq
+        for i in range(1, len(word)):
+            self.prefixes.setdefault(word[:i], 0)
+        if hasattr(self, '_cut_cjk'):
+            self._cut_cjk.cache_clear()
+
+    def fingerprint(self) -> str:
+        """
+        词典的标识（词数和总频率），词典变化后缓存的分词结果失效
+        """
+        return f"{len(self.prefixes)}:{self.total}"
+
+    def cut(self, text: str) -> List[str]:
+        """
+        切分文本，只返回词语（不含标点和空白），非中文部分按 \\w+ 切分
+        :param text: 待切分文本（关键词统计时应先转为小写）
+        """
+        words = []
+        for token in WORD_PATTERN.findall(text):
+            if token.isascii():
+                words.append(token)
+                continue
+            for i, part in enumerate(CJK_PATTERN.split(token)):
+                if i % 2:
+                    words.extend(self._cut_cjk(part))
+                elif part:
+                    words.append(part)
+        return words
+
+    def _cut_cjk_uncached(self, sentence: str) -> tuple:
+        """
+        对一段连续的中文求最大概率切分：
+        先用前缀表列出每个位置开始的所有候选词，再从后往前动态规划
+        """
+        prefixes = self.prefixes
+        log_total = math.log(self.total)
+        length = len(sentence)
+        # route[i] = (从i到句尾的最大对数概率, 该位置选取的词的结束位置)
+        route = [(0.0, 0)] * (length + 1)
+        for start in range(length - 1, -1, -1):
+            # 单字总是候选（未登录字频率按1计）
+            best = (math.log(prefixes.get(sentence[start]) or 1) - log_total + route[start + 1][0], start + 1)
+            end = start + 2
+            fragment = sentence[start:end]
+            while end <= length and fragment in prefixes:
+                freq = prefixes[fragment]
+                if freq:
+                    score = math.log(freq) - log_total + route[end][0]
+                    if score > best[0]:
+                        best = (score, end)
+                end += 1
+                fragment = sentence[start:end]
+            route[start] = best
+
+        words = []
+        start = 0
+        while start < length:
+            end = route[start][1]
+            words.append(sentence[start:end])
+            start = end
+        return tuple(words)
+
+
+def jieba_dict_path() -> Optional[str]:
+    """
+    已安装jieba时返回其自带词典的路径（不导入jieba），否则返回None
+    """
+    spec = importlib.util.find_spec('jieba')
+    if spec is None or not spec.submodule_search_locations:
+        return None
+    path = Path(spec.submodule_search_locations[0]) / 'dict.txt'
+    return str(path) if path.exists() else None
+
+
+_segmenter = None
+_segmenter_lock = threading.Lock()
+
+def get_segmenter() -> Segmenter:
+    """
+    获取进程内共享的分词器，自定义词典读取配置项 segmenter_dict（路径或路径列表），
+    配置项 segmenter_jieba_dict（默认true）开启且已安装jieba时使用jieba的词典作为基础词典
+    """
+    global _segmenter
+    with _segmenter_lock:
+        if _segmenter is None:
+            config = Config()
+            dict_paths = config.get('segmenter_dict') or []
+            if isinstance(dict_paths, str):
+                dict_paths = [dict_paths]
+            base_dict = jieba_dict_path() if config.get('segmenter_jieba_dict', True) else None
+            _segmenter = Segmenter(dict_paths, base_dict)
+        return _segmenter
@@ -1,5 +1,6 @@
 from enum import Enum
 from dataclasses import dataclass
+from typing import Optional
 
 class TaskStatus(Enum):
     IDLE = "idle"
@@ -11,4 +12,47 @@ class TaskStatus(Enum):
 class GenerationState:
     status: TaskStatus
     progress: float
-    message: str 
\ No newline at end of file
+    message: str 
+
+@dataclass
+class GenerationMetrics:
+    """单次生成任务的耗时统计（秒，基于time.monotonic）"""
+    started_at: float
+    first_token_at: Optional[float] = None
+    first_paragraph_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    paragraphs: int = 0
+    token_budget: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    content_chars: int = 0
+    reasoning_chars: int = 0
+    truncated: bool = False  # 输出是否因达到max_tokens被截断
+
+    @property
+    def time_to_first_token(self) -> Optional[float]:
+        if self.first_token_at is None:
+            return None
+        return self.first_token_at - self.started_at
+
+    @property
+    def time_to_first_paragraph(self) -> Optional[float]:
+        if self.first_paragraph_at is None:
+            return None
+        return self.first_paragraph_at - self.started_at
+
+    @property
+    def total_time(self) -> Optional[float]:
+        if self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+    def summary(self) -> str:
+        def fmt(value):
+            return f"{value:.2f}秒" if value is not None else "无"
+        tokens = self.completion_tokens if self.completion_tokens is not None else "未知"
+        return (f"首token耗时 {fmt(self.time_to_first_token)}，"
+                f"首段落耗时 {fmt(self.time_to_first_paragraph)}，"
+                f"总耗时 {fmt(self.total_time)}，段落数 {self.paragraphs}，"
+                f"token用量 {tokens}/{self.token_budget or '未知'}，"
+                f"正文{self.content_chars}字，推理过程{self.reasoning_chars}字"
+                f"{'（被截断）' if self.truncated else ''}")
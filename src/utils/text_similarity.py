@@ -0,0 +1,56 @@
+"""
+文本相似度工具：字符级k-gram分片（shingling）与Jaccard相似度
+按字符切分，中文无需分词即可使用
+"""
+import re
+from typing import FrozenSet, List
+
+NON_WORD_PATTERN = re.compile(r'[\W_]+')
+
+def normalize(text: str) -> str:
+    """
+    转小写并去掉空白和标点
+    """
+    return NON_WORD_PATTERN.sub('', text.lower())
+
+def shingles(text: str, k: int = 3) -> FrozenSet[str]:
+    """
+    返回文本的字符k-gram集合，文本短于k时返回整个文本
+    """
+    text = normalize(text)
+    if len(text) <= k:
+        return frozenset([text]) if text else frozenset()
+    return frozenset(text[i:i + k] for i in range(len(text) - k + 1))
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+def similarity(text_a: str, text_b: str, k: int = 3) -> float:
+    return jaccard(shingles(text_a, k), shingles(text_b, k))
+
+
+class NearDuplicateFilter:
+    """
+    逐条判断文本是否与已接受的文本近似重复
+    """
+    def __init__(self, threshold: float = 0.6, k: int = 3):
+        """
+        :param threshold: Jaccard相似度达到该值视为重复
+        :param k: 分片长度（字符数）
+        """
+        self.threshold = threshold
+        self.k = k
+        self.accepted: List[FrozenSet[str]] = []
+
+    def add(self, text: str) -> bool:
+        """
+        文本与已接受的文本都不重复时接受它
+        :return: 是否接受
+        """
+        candidate = shingles(text, self.k)
+        if any(jaccard(candidate, other) >= self.threshold for other in self.accepted):
+            return False
+        self.accepted.append(candidate)
+        return True
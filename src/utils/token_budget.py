@@ -0,0 +1,179 @@
+import json
+import logging
+import math
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Optional, Tuple
+from utils.config import Config
+
+THINK_PATTERN = re.compile(r'<think>.*?</think>', re.DOTALL)
+
+def split_reasoning(text: str, reasoning_content: Optional[str] = None) -> Tuple[str, str]:
+    """
+    分离R1的推理过程和最终正文
+    兼容 reasoning_content 字段、完整的<think>标签以及缺少开始标签只有</think>的情况
+    :return: (推理过程, 正文)
+    """
+    text = text or ''
+    reasoning = [reasoning_content] if reasoning_content else []
+
+    if '</think>' in text and '<think>' not in text.split('</think>', 1)[0]:
+        head, text = text.split('</think>', 1)
+        reasoning.append(head)
+
+    reasoning.extend(match.group()[len('<think>'):-len('</think>')]
+                     for match in THINK_PATTERN.finditer(text))
+    content = THINK_PATTERN.sub('', text)
+
+    # 未闭合的<think>（输出被截断）之后全部视为推理过程
+    if '<think>' in content:
+        content, unfinished = content.split('<think>', 1)
+        reasoning.append(unfinished)
+
+    return '\n'.join(part.strip() for part in reasoning if part.strip()), content.strip()
+
+
+class ReasoningFilter:
+    """
+    流式输出的推理过程过滤器，处理跨数据块被截断的<think>/</think>标签
+    """
+    OPEN_TAG = '<think>'
+    CLOSE_TAG = '</think>'
+
+    def __init__(self):
+        self.in_reasoning = False
+        self.pending = ''
+        self.reasoning_chars = 0
+
+    def feed(self, text: str) -> str:
+        """
+        输入一段流式文本，返回其中属于正文的部分
+        """
+        text = self.pending + text
+        self.pending = ''
+        output = []
+
+        while text:
+            tag = self.CLOSE_TAG if self.in_reasoning else self.OPEN_TAG
+            index = text.find(tag)
+            if index == -1:
+                # 末尾可能是被截断的标签，留到下一块再判断
+                keep = self._partial_tag_length(text, tag)
+                body = text[:len(text) - keep]
+                self.pending = text[len(text) - keep:]
+                self._emit(body, output)
+                break
+            self._emit(text[:index], output)
+            text = text[index + len(tag):]
+            self.in_reasoning = not self.in_reasoning
+
+        return ''.join(output)
+
+    def flush(self) -> str:
+        text, self.pending = self.pending, ''
+        output = []
+        self._emit(text, output)
+        return ''.join(output)
+
+    def _emit(self, text, output):
+        if self.in_reasoning:
+            self.reasoning_chars += len(text)
+        else:
+            output.append(text)
+
+    @staticmethod
+    def _partial_tag_length(text: str, tag: str) -> int:
+        for length in range(min(len(tag) - 1, len(text)), 0, -1):
+            if tag.startswith(text[-length:]):
+                return length
+        return 0
+
+
+class TokenBudgetPlanner:
+    """
+    根据目标字数规划 max_tokens
+    每字符token数（中文为主）和推理过程长度从历史响应中按指数滑动平均学习，
+    校准结果保存在缓存目录，进程间共享
+    """
+    DEFAULT_CHARS_PER_TOKEN = 1.5
+    DEFAULT_REASONING_CHARS = 3000
+    SMOOTHING = 0.2
+    TRUNCATION_GROWTH = 1.5  # 被截断后推理过程预算的放大倍数
+
+    def __init__(self):
+        self.config = Config()
+        self.logger = logging.getLogger(__name__)
+        self.headroom = self.config.get('token_budget_headroom', 1.5)
+        self.min_tokens = self.config.get('token_budget_min', 1024)
+        self.max_tokens = self.config.get('token_budget_max', 10240)
+        self.calibration_file = Path(self.config.get('cache_dir', 'cache')) / 'token_budget.json'
+        self._lock = threading.Lock()
+
+        self.chars_per_token = self.DEFAULT_CHARS_PER_TOKEN
+        self.reasoning_chars = self.DEFAULT_REASONING_CHARS
+        self.samples = 0
+        self._load()
+
+    def plan(self, word_count: int) -> int:
+        """
+        计算本次请求的 max_tokens：正文预算（含余量）加上推理过程预算
+        """
+        expected_chars = word_count * self.headroom + self.reasoning_chars
+        budget = math.ceil(expected_chars / self.chars_per_token)
+        return max(self.min_tokens, min(self.max_tokens, budget))
+
+    def expand(self, budget: int) -> int:
+        """
+        被截断后重试使用的 max_tokens：加倍，不超过 token_budget_max
+        """
+        return min(self.max_tokens, budget * 2)
+
+    def record(self, budget: int, content_chars: int, reasoning_chars: int,
+               completion_tokens: Optional[int], truncated: bool = False):
+        """
+        记录一次响应的实际消耗并更新校准参数
+        :param budget: 本次请求的 max_tokens
+        :param content_chars: 正文字数
+        :param reasoning_chars: 推理过程字数
+        :param completion_tokens: 接口返回的输出token数，无法获取时为None
+        :param truncated: 输出是否因达到 max_tokens 被截断
+        """
+        total_chars = content_chars + reasoning_chars
+        with self._lock:
+            if completion_tokens and total_chars:
+                alpha = self.SMOOTHING if self.samples else 1.0
+                self.chars_per_token += alpha * (total_chars / completion_tokens - self.chars_per_token)
+                if not truncated:
+                    self.reasoning_chars += alpha * (reasoning_chars - self.reasoning_chars)
+                self.samples += 1
+            if truncated:
+                # 被截断时实际需要的长度未知，推理过程预算至少提高到本次的推理长度再放大，之后的规划随之提高
+                self.reasoning_chars = max(self.reasoning_chars, reasoning_chars) * self.TRUNCATION_GROWTH
+                self.logger.warning(f"输出达到max_tokens上限({budget})被截断，"
+                                    f"推理过程预估提高到{self.reasoning_chars:.0f}字")
+            elif not (completion_tokens and total_chars):
+                return
+            self._save()
+
+    def _load(self):
+        try:
+            with open(self.calibration_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.chars_per_token = data['chars_per_token']
+            self.reasoning_chars = data['reasoning_chars']
+            self.samples = data['samples']
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def _save(self):
+        self.calibration_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.calibration_file.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                'chars_per_token': self.chars_per_token,
+                'reasoning_chars': self.reasoning_chars,
+                'samples': self.samples
+            }, f)
+        os.replace(tmp_file, self.calibration_file)
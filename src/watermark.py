@@ -0,0 +1,134 @@
+import logging
+import os
+import uuid
+from functools import lru_cache
+from PIL import Image, ImageDraw, ImageFont
+from utils.config import Config
+
+logger = logging.getLogger(__name__)
+
+# GUI中的水印位置选项
+POSITIONS = {
+    '左上角': 'top-left',
+    '右上角': 'top-right',
+    '左下角': 'bottom-left',
+    '右下角': 'bottom-right',
+    '居中': 'center'
+}
+
+# 常见的中文字体位置（Linux / Windows / macOS）
+CJK_FONT_CANDIDATES = [
+    '/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc',
+    '/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc',
+    '/usr/share/fonts/google-noto-cjk/NotoSansCJK-Regular.ttc',
+    '/usr/share/fonts/truetype/wqy/wqy-microhei.ttc',
+    '/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc',
+    '/usr/share/fonts/wqy-microhei/wqy-microhei.ttc',
+    '/usr/share/fonts/truetype/droid/DroidSansFallbackFull.ttf',
+    'C:/Windows/Fonts/msyh.ttc',
+    'C:/Windows/Fonts/simhei.ttf',
+    'C:/Windows/Fonts/simsun.ttc',
+    '/System/Library/Fonts/PingFang.ttc',
+    '/System/Library/Fonts/STHeiti Medium.ttc',
+    '/Library/Fonts/Arial Unicode.ttf'
+]
+
+PADDING = 20
+
+def normalize_position(position):
+    """
+    将GUI中的中文位置选项转换为内部位置标识
+    """
+    return POSITIONS.get(position, position or 'bottom-right')
+
+@lru_cache(maxsize=1)
+def resolve_font_path():
+    """
+    查找可显示中文的字体，优先使用配置项 watermark_font，结果在进程内缓存
+    :return: 字体文件路径，找不到时返回None
+    """
+    configured = Config().get('watermark_font')
+    for path in ([configured] if configured else []) + CJK_FONT_CANDIDATES:
+        if os.path.exists(path):
+            logger.info(f"水印字体：{path}")
+            return path
+    logger.warning("未找到中文字体，水印将使用默认字体（无法显示中文），可通过配置项 watermark_font 指定")
+    return None
+
+@lru_cache(maxsize=32)
+def load_font(size):
+    path = resolve_font_path()
+    if path:
+        return ImageFont.truetype(path, size)
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        # Pillow 10.1 之前的默认字体是固定大小的位图字体，不支持 size 参数
+        return ImageFont.load_default()
+
+@lru_cache(maxsize=256)
+def _text_mask(text, font_size, opacity):
+    """
+    预先渲染水印文字的透明度蒙版（只包含文字区域）
+    """
+    font = load_font(font_size)
+    left, top, right, bottom = font.getbbox(text)
+    mask = Image.new('L', (max(1, right - left), max(1, bottom - top)), 0)
+    ImageDraw.Draw(mask).text((-left, -top), text, font=font, fill=int(255 * opacity))
+    return mask
+
+@lru_cache(maxsize=256)
+def get_overlay(image_size, text, position, opacity):
+    """
+    按 (图片尺寸, 文字, 位置, 透明度) 缓存水印蒙版及其粘贴位置
+    :return: (蒙版, (x, y))
+    """
+    width, height = image_size
+    # 小图按比例计算的字号可能为0
+    mask = _text_mask(text, max(1, int(min(width, height) * 0.05)), opacity)
+    text_width, text_height = mask.size
+
+    if position == 'bottom-right':
+        xy = (width - text_width - PADDING, height - text_height - PADDING)
+    elif position == 'bottom-left':
+        xy = (PADDING, height - text_height - PADDING)
+    elif position == 'top-right':
+        xy = (width - text_width - PADDING, PADDING)
+    elif position == 'center':
+        xy = ((width - text_width) // 2, (height - text_height) // 2)
+    else:  # top-left
+        xy = (PADDING, PADDING)
+    return mask, xy
+
+def apply_watermark(image, text, position='bottom-right', opacity=0.5):
+    """
+    添加白色半透明文字水印，只在文字所在区域内混合像素
+    :param image: PIL图片
+    :param text: 水印文字
+    :param position: 水印位置，支持GUI中的中文选项
+    :param opacity: 不透明度（0~1）
+    :return: 添加水印后的新图片，不修改传入的图片
+    """
+    image = image.convert('RGB') if image.mode not in ('RGB', 'RGBA') else image.copy()
+    mask, xy = get_overlay(image.size, text, normalize_position(position), opacity)
+    fill = (255, 255, 255, 255) if image.mode == 'RGBA' else (255, 255, 255)
+    image.paste(fill, (xy[0], xy[1], xy[0] + mask.width, xy[1] + mask.height), mask)
+    return image
+
+def watermark_file(src_path, dst_path, text, position='bottom-right', opacity=0.5):
+    """
+    从文件读取图片，添加水印后原子写入目标文件（可与源文件相同）
+    :return: 目标文件路径
+    """
+    tmp_path = f"{dst_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with Image.open(src_path) as image:
+            image_format = image.format
+            image.load()
+            image = apply_watermark(image, text, position, opacity)
+        image.save(tmp_path, format=image_format or 'PNG')
+        os.replace(tmp_path, dst_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return dst_path
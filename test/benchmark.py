@@ -0,0 +1,305 @@
+"""
+离线性能基准：使用合成的中英文Markdown文章（1千~20万字）测试
+SEOOptimizer.optimize、DocumentWriter.create_document、水印和配图提示词提取的耗时、吞吐量与峰值内存，
+并与保存的基准对比（基准按固定校准负载在各项目前后多次测量的最短耗时换算到本机速度），超过阈值视为性能回退（退出码为1）；
+生成Word文档另外检查耗时与文章长度、图片数是否成线性关系，重新发布检查未修改的文章是否全部命中文章清单
+
+用法：
+    python test/benchmark.py                   # 运行并与基准对比
+    python test/benchmark.py --save-baseline   # 运行并保存为新的基准
+    python test/benchmark.py --filter seo      # 只运行名称包含seo的项目
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'src'))
+
+from PIL import Image
+from article_manifest import ArticleManifest
+from seo_optimizer import SEOOptimizer
+from document_writer import DocumentWriter
+from image_generator import ImageGenerator
+from watermark import apply_watermark
+from utils.segmenter import get_segmenter
+
+BASELINE_FILE = Path(__file__).resolve().parent / 'benchmark_baseline.json'
+CALIBRATION = 'calibration'  # 基准文件中校准负载耗时的键
+CALIBRATION_ROUNDS = 3  # 各项目之前和之后分别测量校准负载的次数
+TEXT_LENGTHS = (5000, 50000, 200000)  # 不含图片的文档长度
+IMAGE_COUNTS = (3, 15, 60)  # 多图文档的图片数
+SCALING_LIMIT = 2.0  # 线性检查允许的比值，明显大于1说明耗时随长度或图片数超线性增长（改动前的实现约为3）
+
+CN_WORDS = ['人工智能', '技术', '发展', '企业', '用户', '数据', '模型', '系统', '应用', '平台', '服务',
+            '市场', '创新', '效率', '安全', '管理', '的', '了', '在', '和', '是', '也', '通过', '进行',
+            '正在', '改变', '随着', '不断', '提高', '需要', '未来', '行业', '搜索引擎优化', '内容营销']
+EN_WORDS = ['artificial', 'intelligence', 'technology', 'development', 'enterprise', 'user', 'data',
+            'model', 'system', 'application', 'platform', 'service', 'market', 'innovation', 'the',
+            'of', 'and', 'to', 'in', 'is', 'for', 'with', 'search', 'engine', 'optimization', 'content']
+
+
+def make_article(chars, lang='cn', seed=0):
+    """
+    生成指定长度的合成Markdown文章（标题、多级小标题和长短不一的段落）
+    """
+    rng = random.Random(seed)
+    words, joiner, stops = (CN_WORDS, '', '。！？') if lang == 'cn' else (EN_WORDS, ' ', '.!?')
+
+    def sentence():
+        return joiner.join(rng.choice(words) for _ in range(rng.randint(6, 20))) + rng.choice(stops)
+
+    parts = ['# ' + joiner.join(rng.choice(words) for _ in range(4))]
+    size = len(parts[0])
+    while size < chars:
+        if rng.random() < 0.15:
+            block = '#' * rng.randint(2, 4) + ' ' + joiner.join(rng.choice(words) for _ in range(3))
+        else:
+            block = joiner.join(sentence() for _ in range(rng.randint(2, 12)))
+        parts.append(block)
+        size += len(block) + 2
+    return '\n\n'.join(parts)[:chars]
+
+
+class OfflineImageGenerator(ImageGenerator):
+    """
+    不需要API密钥的图片生成器，只用于测试提示词提取
+    """
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self.prompt_similarity = 0.6
+
+
+def measure(func, min_time=1.0, max_runs=200):
+    """
+    重复执行直到累计耗时达到min_time，返回最短的一次耗时（秒，受系统抖动影响最小）和峰值内存（KB）
+    峰值内存单独执行一次并用tracemalloc统计（只包含Python分配，不含Pillow等C扩展内部的内存），不影响计时
+    """
+    func()  # 预热（加载字体、分词词典等一次性开销）
+    durations = []
+    # 与timeit一样计时期间关闭垃圾回收，避免回收时机带来的波动
+    gc.collect()
+    gc.disable()
+    try:
+        started = time.perf_counter()
+        while len(durations) < max_runs and (time.perf_counter() - started < min_time or len(durations) < 3):
+            begin = time.perf_counter()
+            func()
+            durations.append(time.perf_counter() - begin)
+    finally:
+        gc.enable()
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(durations), peak / 1024
+
+
+def calibrate():
+    """
+    固定的纯Python校准负载（字符串切片和字典计数），耗时反映本机的速度，
+    与基准中保存的校准耗时之比用于换算基准，使同一份基准可以在不同机器上比较
+    :return: 校准负载的最短耗时（秒）
+    """
+    text = make_article(20000, 'cn', seed=1)
+
+    def work():
+        counts = {}
+        for i in range(len(text) - 1):
+            gram = text[i:i + 2]
+            counts[gram] = counts.get(gram, 0) + 1
+        return sorted(counts.items(), key=lambda item: -item[1])[:100]
+
+    return measure(work)[0]
+
+
+def build_cases(workdir):
+    """
+    返回 [(名称, 函数, 处理量, 单位)]
+    """
+    cases = []
+    optimizer = SEOOptimizer()
+    segmenter = get_segmenter()
+
+    def optimize(article):
+        # 清空分词缓存，测量首次处理一篇文章的耗时
+        segmenter._cut_cjk.cache_clear()
+        return optimizer.optimize(article)
+
+    for lang in ('cn', 'en'):
+        for chars in (1000, 5000, 20000, 50000):
+            article = make_article(chars, lang, seed=chars)
+            cases.append((f'seo_optimize_{lang}_{chars}', lambda a=article: optimize(a), chars, 'chars'))
+
+    image_paths = []
+    for i in range(3):
+        path = workdir / f'image_{i}.png'
+        Image.effect_noise((1024, 1024), 40).convert('RGB').save(path)
+        image_paths.append(str(path))
+    # 多图文档使用较小的不同图片，只测量插入图片本身的开销
+    many_image_paths = []
+    for i in range(max(IMAGE_COUNTS)):
+        path = workdir / f'small_{i}.png'
+        Image.effect_noise((320, 240), 20 + i).convert('RGB').save(path)
+        many_image_paths.append(str(path))
+
+    writer = DocumentWriter()
+    writer.output_dir = str(workdir / 'output')
+    for chars in (5000, 50000):
+        article = optimizer.optimize(make_article(chars, 'cn', seed=chars))
+        cases.append((f'create_document_{chars}',
+                      lambda a=article: writer.create_document(a, image_paths, 'benchmark'), chars, 'chars'))
+    for chars in TEXT_LENGTHS:
+        text = optimizer.optimize(make_article(chars, 'cn', seed=chars))
+        cases.append((f'create_document_text_{chars}',
+                      lambda a=text: writer.create_document(a, [], 'benchmark'), chars, 'chars'))
+    for count in IMAGE_COUNTS:
+        cases.append((f'create_document_50000_img{count}',
+                      lambda a=article, n=count: writer.create_document(a, many_image_paths[:n], 'benchmark'),
+                      count, 'images'))
+
+    image = Image.open(image_paths[0]).convert('RGB')
+    image.load()
+    cases.append(('add_watermark_1024', lambda: apply_watermark(image, '版权所有', '右下角', 0.5),
+                  1, 'images'))
+
+    image_gen = OfflineImageGenerator()
+    for chars in (5000, 50000):
+        article = make_article(chars, 'cn', seed=chars)
+        cases.append((f'extract_image_prompts_{chars}',
+                      lambda a=article: image_gen._extract_image_prompts(a), chars, 'chars'))
+    return cases
+
+
+def check_scaling(results):
+    """
+    检查生成Word文档的耗时与文章长度、图片数成线性关系：
+    比较前后两段区间的边际耗时（不含图片时5万~20万字与5千~5万字的每千字耗时，
+    5万字文章中15~60张与3~15张图片的每张图片耗时），
+    线性时比值约为1，随长度或图片数超线性增长时明显大于1
+    :return: [(检查项, 比值)]，缺少所需项目时为空
+    """
+    seconds = {name: result['seconds'] for name, result in results.items()}
+    groups = [
+        ('每千字耗时', [(chars // 1000, f'create_document_text_{chars}') for chars in TEXT_LENGTHS]),
+        ('每张图片耗时', [(count, f'create_document_50000_img{count}') for count in IMAGE_COUNTS])
+    ]
+    checks = []
+    for label, points in groups:
+        if not all(name in seconds for _, name in points):
+            continue
+        (x0, a), (x1, b), (x2, c) = [(x, seconds[name]) for x, name in points]
+        low = (b - a) / (x1 - x0)
+        high = (c - b) / (x2 - x1)
+        checks.append((f'{label} {x1}~{x2}/{x0}~{x1}', high / low if low > 0 else float('inf')))
+    return checks
+
+
+def check_republish(workdir, name='republish_unchanged'):
+    """
+    按批量生成的流程发布一篇文章（SEO优化、生成文档并保存原文和文章清单），
+    再从保存的原文（.source.md）重新发布，未修改的文章应全部命中文章清单
+    :return: 重新发布时未命中的条目数
+    """
+    optimizer = SEOOptimizer()
+    writer = DocumentWriter()
+    writer.output_dir = str(workdir / 'republish')
+    article = make_article(20000, 'cn', seed=7)
+    for _ in range(2):
+        manifest = ArticleManifest(name)
+        writer.create_document(optimizer.optimize(article, manifest), [], name, manifest, article)
+        manifest.save()
+        article = (Path(writer.output_dir) / f'article_{name}{writer.SOURCE_SUFFIX}').read_text(encoding='utf-8')
+    return manifest.misses
+
+
+def main():
+    parser = argparse.ArgumentParser(description='SEOOptimizer / DocumentWriter 离线性能基准')
+    parser.add_argument('--save-baseline', action='store_true', help='将本次结果保存为基准')
+    parser.add_argument('--threshold', type=float, default=0.25, help='允许的回退比例，默认0.25（慢25%以上视为回退）')
+    parser.add_argument('--filter', type=str, default='', help='只运行名称包含该字符串的项目')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    baseline = json.loads(BASELINE_FILE.read_text(encoding='utf-8')) if BASELINE_FILE.exists() else {}
+    results = {}
+    regressions = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # 缓存和输出文件都写到临时目录
+        os.chdir(tmp)
+        workdir = Path(tmp)
+        cases = [case for case in build_cases(workdir) if args.filter in case[0]]
+        # 校准负载在各项目之前和之后各测几次取最快，排除系统负载和CPU频率变化等临时的波动；
+        # 校准偏慢会放大基准、掩盖真实的回退
+        calibrations = [calibrate() for _ in range(CALIBRATION_ROUNDS)]
+        measured = [(case, measure(case[1])) for case in cases]
+        calibrations += [calibrate() for _ in range(CALIBRATION_ROUNDS)]
+        calibration = min(calibrations)
+        # 本机与保存基准的机器的速度之比，旧的基准文件没有校准值时按1计算
+        reference_calibration = baseline.get(CALIBRATION, {}).get('seconds')
+        speed = calibration / reference_calibration if reference_calibration else 1.0
+        print(f"校准负载 {calibration * 1000:.2f}ms（{min(calibrations) * 1000:.2f}~{max(calibrations) * 1000:.2f}ms），"
+              f"基准按 {speed:.2f}x 换算\n")
+
+        print(f"{'项目':<30}{'耗时(ms)':>12}{'吞吐量':>18}{'峰值内存(KB)':>14}{'基准(ms)':>12}")
+        for (name, func, amount, unit), (seconds, peak_kb) in measured:
+            expected = baseline[name]['seconds'] * speed if name in baseline else None
+            # 超过阈值时再测两次取最快，排除偶发的系统抖动
+            for _ in range(2):
+                if not expected or seconds <= expected * (1 + args.threshold):
+                    break
+                seconds = min(seconds, measure(func)[0])
+            results[name] = {'seconds': round(seconds, 6), 'peak_kb': round(peak_kb, 1)}
+
+            status = ''
+            if expected:
+                ratio = seconds / expected
+                status = f"{expected * 1000:>12.2f}  {ratio:.2f}x"
+                if ratio > 1 + args.threshold:
+                    regressions.append(name)
+                    status += '  回退'
+            print(f"{name:<30}{seconds * 1000:>12.2f}{amount / seconds:>14.0f} {unit}/s{peak_kb:>14.0f}{status}")
+
+        name = 'republish_unchanged'
+        if args.filter in name:
+            misses = check_republish(workdir, name)
+            print(f"\n重新发布未修改的文章：未命中文章清单{misses}项")
+            if misses:
+                regressions.append(name)
+
+    scaling = check_scaling(results)
+    if scaling:
+        print(f"\n线性检查（比值不超过{SCALING_LIMIT}）：")
+        for name, ratio in scaling:
+            status = ''
+            if ratio > SCALING_LIMIT:
+                regressions.append(name)
+                status = '  超线性'
+            print(f"  {name:<28}{ratio:>8.2f}{status}")
+
+    if args.save_baseline:
+        # 已保存的其他项目按本机速度换算，与新的校准值保持一致
+        for name, result in baseline.items():
+            if name != CALIBRATION and name not in results:
+                result['seconds'] = round(result['seconds'] * speed, 6)
+        baseline.update(results)
+        baseline[CALIBRATION] = {'seconds': round(calibration, 6)}
+        BASELINE_FILE.write_text(json.dumps(baseline, indent=2, ensure_ascii=False) + '\n', encoding='utf-8')
+        print(f"\n基准已保存：{BASELINE_FILE}")
+    elif regressions:
+        print(f"\n性能回退（超过{args.threshold:.0%}、超线性或重新发布未命中清单）：{', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()